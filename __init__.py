@@ -1 +1,3 @@
-__version__ = "0.1"
\ No newline at end of file
+__version__ = "0.1"
+
+from .backends import generate, register_backend, get_backends, get_available_backends
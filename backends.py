@@ -0,0 +1,209 @@
+"""This module provides a single entry point to the generators of the
+package, whatever their implementation :
+
+    hmap, backend = generate((3,4), {"S":256, "SEED":12})
+    hmaps, backend = generate([(0,0),(1,0),(2,0)], params, backend="threads")
+
+<params> is a dict of the attributes listed in numpygen.noisegen.Cache.PARAMS
+(and "sdegree"), plus "noise", the name of the cache class ("ZeroGradient" by
+default, "NoiseCache" or "Perlin"). Missing ones keep the defaults of Cache.
+
+Each backend is registered with a function telling whether it can serve a
+request (it may depend on the installed modules, the parameters and the
+number of chunks) and a priority. With backend="auto", the available backend
+of highest priority is used, and its name is returned with the result :
+
+    - "processes" : numpygen.farm.ChunkFarm, for many chunks on several cores
+    - "c" : the compiled kernel of numpygen.ckernel, for ZeroGradient
+    - "threads" : numpygen.farm.generate_chunks_threaded, for several chunks on
+      several cores
+    - "numpy" : numpygen.noisegen
+    - "pure" : purepython.hashed, without numpy. Only for ZeroGradient with
+      LATTICE="hash" (which needs WORLD_SIDE_CHUNKS, e.g. None for an
+      unbounded world), it returns lists instead of arrays.
+
+All of them give the same heights for the same parameters, so new backends can
+be registered (see register_backend) without changing the results.
+"""
+import atexit
+import numbers
+import os
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+NOISES = ("ZeroGradient", "NoiseCache", "Perlin")
+#minimum number of pixels for which starting worker processes is worth it
+PROCESSES_MIN_PIXELS = 64*512*512
+
+_backends = {} #name -> (generate, supports, priority)
+_caches = {} #built numpygen caches, by parameters
+_farms = {} #running ChunkFarm, by parameters
+
+
+class Request:
+    """What a backend is asked to generate. <params> does not contain
+    "noise"."""
+
+    def __init__(self, chunks, noise:str, params:dict):
+        self.chunks = chunks
+        self.noise = noise
+        self.params = params
+        self.key = (noise,) + tuple(sorted((name, _freeze(value))
+                                           for name, value in params.items()))
+
+    def get_pixels(self)->int:
+        return len(self.chunks)*self.params.get("S", 512)**2
+
+
+def _freeze(value): #hashable version of a parameter value
+    if isinstance(value, list):
+        return tuple(value)
+    return value
+
+def register_backend(name:str, generate, supports, priority:int):
+    """Registers (or replaces) the backend <name>. <generate>(request) returns
+    the (N,S,S) heightmaps of request.chunks, <supports>(request) tells whether
+    it can. Auto dispatch tries the backends by decreasing <priority>."""
+    _backends[name] = (generate, supports, priority)
+
+def get_backends()->list[str]:
+    """Names of the registered backends, by decreasing priority."""
+    return sorted(_backends, key=lambda name:-_backends[name][2])
+
+def get_available_backends(chunks, params:dict|None=None)->list[str]:
+    """Names of the backends that can generate <chunks> (see generate) with
+    <params>, by decreasing priority."""
+    request = _get_request(chunks, params)[0]
+    return [name for name in get_backends() if _backends[name][1](request)]
+
+def _get_request(chunks, params):
+    params = dict(params or {})
+    noise = params.pop("noise", "ZeroGradient")
+    if noise not in NOISES:
+        raise ValueError("Unknown noise: " + str(noise))
+    single = len(chunks) == 2 and all(isinstance(v, numbers.Integral) for v in chunks)
+    if single:
+        chunks = [tuple(chunks)]
+    else:
+        chunks = [(int(l), int(t)) for l,t in chunks]
+    return Request(chunks, noise, params), single
+
+def generate(chunks, params:dict|None=None, backend:str="auto"):
+    """Returns (result, name), where result is the heightmap of <chunks> if it
+    is a chunk (l,t), or the (N,S,S) heightmaps of each chunk if it is a
+    sequence of chunks, and name is the backend that generated it.
+    <params> are the parameters of the noise (see the module doc), and
+    <backend> is a name of get_backends() or "auto"."""
+    request, single = _get_request(chunks, params)
+    if backend == "auto":
+        for name in get_backends():
+            if _backends[name][1](request):
+                backend = name
+                break
+        else:
+            raise ValueError("No backend can generate this request (numpy missing ?)")
+    elif backend not in _backends:
+        raise ValueError("Unknown backend: " + str(backend))
+    elif not _backends[backend][1](request):
+        raise ValueError("Backend " + backend + " cannot generate this request")
+    result = _backends[backend][0](request)
+    return (result[0] if single else result), backend
+
+
+#numpygen backends #############################################################
+def _get_cache(request):
+    c = _caches.get(request.key)
+    if c is None:
+        from .numpygen import noisegen as ng
+        cls = getattr(ng, request.noise)
+        unknown = set(request.params) - set(cls.PARAMS)
+        if unknown:
+            raise ValueError("Unknown parameters: " + ", ".join(sorted(unknown)))
+        c = cls.from_params(request.params)
+        _caches[request.key] = c
+    return c
+
+def _get_cores():
+    return os.cpu_count() or 1
+
+def _has_numpy(request):
+    return np is not None
+
+def _generate_numpy(request):
+    from .numpygen import noisegen as ng
+    return ng.generate_chunks(request.chunks, _get_cache(request))
+
+def _supports_c(request):
+    if np is None or request.noise != "ZeroGradient":
+        return False
+    from .numpygen import ckernel
+    return ckernel.is_available() and\
+           np.dtype(request.params.get("DTYPE", "float64")) == np.float64
+
+def _generate_c(request):
+    from .numpygen import ckernel
+    c = _get_cache(request)
+    out = np.zeros((len(request.chunks),c.S,c.S))
+    for i, chunk in enumerate(request.chunks):
+        ckernel.generate_terrain(chunk, c, out[i])
+    return out
+
+def _supports_threads(request):
+    return np is not None and len(request.chunks) > 1 and _get_cores() > 1
+
+def _generate_threads(request):
+    from .numpygen import farm
+    return farm.generate_chunks_threaded(request.chunks, _get_cache(request))
+
+def _supports_processes(request):
+    return np is not None and _get_cores() > 1 and len(request.chunks) > 1 and\
+           request.get_pixels() >= PROCESSES_MIN_PIXELS
+
+def _generate_processes(request):
+    f = _farms.get(request.key)
+    if f is None:
+        from .numpygen import farm
+        f = farm.ChunkFarm(_get_cache(request))
+        _farms[request.key] = f
+    return f.generate_chunks(request.chunks)
+
+def close():
+    """Stops the worker processes started by the "processes" backend and
+    forgets the built caches."""
+    for f in _farms.values():
+        f.close()
+    _farms.clear()
+    _caches.clear()
+
+atexit.register(close)
+
+
+#pure python backend ###########################################################
+_PURE_PARAMS = ("S", "DEPTH", "H_DIVIDER", "DOM_DIVIDER", "MIN_N", "SEED",
+                "WORLD_SIDE_CHUNKS", "sdegree")
+
+def _supports_pure(request):
+    params = request.params
+    if request.noise != "ZeroGradient" or params.get("LATTICE") != "hash":
+        return False
+    if set(params) - set(_PURE_PARAMS) - {"LATTICE", "PRNG", "DTYPE"}:
+        return False
+    dtype = params.get("DTYPE", "float64")
+    if np is not None:
+        return np.dtype(dtype) == np.float64
+    return dtype in ("float64", float)
+
+def _generate_pure(request):
+    from .purepython import hashed
+    kwargs = {name:value for name,value in request.params.items() if name in _PURE_PARAMS}
+    return [hashed.generate_terrain(chunk, **kwargs) for chunk in request.chunks]
+
+
+register_backend("processes", _generate_processes, _supports_processes, 50)
+register_backend("c", _generate_c, _supports_c, 40)
+register_backend("threads", _generate_threads, _supports_threads, 30)
+register_backend("numpy", _generate_numpy, _has_numpy, 20)
+register_backend("pure", _generate_pure, _supports_pure, 10)
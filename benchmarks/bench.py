@@ -0,0 +1,199 @@
+"""This module times the terrain generators of the numpy and pure python
+implementations, for several noise types and parameters, and compares the
+results with a previous run.
+
+usage : run the following command from the parent folder of the package:
+'python -m thornoise2.benchmarks.bench --output new.json --baseline old.json'
+Use --quick for a small sweep, and --help for all the options.
+
+Each result gives the best time over several repetitions, the number of
+chunks and pixels generated per second, and the peak memory allocated during
+one call (measured in a separate call, with tracemalloc).
+A case is a regression when its time exceeds the baseline time by more than
+the threshold (20% by default) ; the exit code is then 1.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+if __package__ in {None, ""}:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if __package__:
+    from ..numpygen import colorscale
+    from ..numpygen import noisegen as ng
+    from ..purepython import noisegen as pg
+else:
+    from numpygen import colorscale
+    from numpygen import noisegen as ng
+    from purepython import noisegen as pg
+
+NOISES = {"ZeroGradient":ng.ZeroGradient, "NoiseCache":ng.NoiseCache,
+          "Perlin":ng.Perlin}
+
+SWEEPS = {"full":dict(sizes=(128, 256, 512), depths=(5, 7), min_ns=(1, 2),
+                      batches=(1, 8, 32), pure_sizes=(32, 64), pure_depths=(4, 5)),
+          "quick":dict(sizes=(64,), depths=(4,), min_ns=(1,),
+                       batches=(4,), pure_sizes=(16,), pure_depths=(3,))}
+
+
+class Case:
+
+    def __init__(self, name, params, setup, chunks, pixels):
+        """<setup> returns the function to time (without argument), so that
+        building caches is not timed. <chunks> and <pixels> are the amounts
+        generated by one call."""
+        self.name = name
+        self.params = params
+        self.setup = setup
+        self.chunks = chunks
+        self.pixels = pixels
+
+    def get_id(self):
+        params = ",".join("%s=%s" % item for item in sorted(self.params.items()))
+        return "%s[%s]" % (self.name, params)
+
+
+def _build(noise, S, depth, min_n):
+    c = NOISES[noise]()
+    c.S, c.DEPTH, c.MIN_N = S, depth, min_n
+    #with the default (1,1), the right and bottom edges of every chunk would
+    #be those of chunk 0, so the chunks of a batch would not share their
+    #edges as in a real world (see generate_chunks). Any world larger than
+    #the benchmarked chunks will do.
+    c.WORLD_SIDE_CHUNKS = (1000, 1000)
+    with contextlib.redirect_stdout(io.StringIO()): #build prints its progress
+        c.build()
+    return c
+
+def _run_pure(f, use_numpy, S, depth):
+    pg.USE_NUMPY = use_numpy
+    try:
+        return f(S, depth, (3,4))
+    finally:
+        pg.USE_NUMPY = True
+
+def get_cases(sweep):
+    cases = []
+    for noise in NOISES:
+        for S in sweep["sizes"]:
+            for depth in sweep["depths"]:
+                for min_n in sweep["min_ns"]:
+                    if min_n*2**(depth-1) > S:
+                        continue
+                    p = dict(noise=noise, S=S, DEPTH=depth, MIN_N=min_n)
+                    b = lambda noise=noise, S=S, depth=depth, min_n=min_n: _build(noise, S, depth, min_n)
+                    cases.append(Case("numpygen.Cache.build", p, lambda b=b: b, 0, 0))
+                    cases.append(Case("numpygen.generate_terrain", p,
+                        lambda b=b: (lambda c=b(): ng.generate_terrain((3,4), c)), 1, S*S))
+                    cases.append(Case("numpygen.generate_rect_terrain", p,
+                        lambda b=b: (lambda c=b(): ng.generate_rect_terrain((3,4), c, 1, 1)), 1, S*S))
+                    if noise == "ZeroGradient": #other polynoms need gradients
+                        cases.append(Case("numpygen.generate_terrain_d2m1n3", p,
+                            lambda b=b: (lambda c=b(): ng.generate_terrain_d2m1n3((3,4), c)), 1, S*S))
+                    for batch in sweep["batches"]:
+                        chunks = [(3+i%8, 4+i//8) for i in range(batch)]
+                        cases.append(Case("numpygen.generate_chunks", dict(p, batch=batch),
+                            lambda b=b, chunks=chunks: (lambda c=b(): ng.generate_chunks(chunks, c)),
+                            batch, batch*S*S))
+    for S in sweep["sizes"]:
+        hmap = np.random.default_rng(0).random((S,S))
+        for name in ("get", "get_lut", "get_by_bands"):
+            cases.append(Case("colorscale.ColorScale." + name, dict(S=S),
+                lambda hmap=hmap, f=getattr(colorscale.SUMMER, name): (lambda: f(hmap)),
+                0, S*S))
+    for S in sweep["pure_sizes"]:
+        for depth in sweep["pure_depths"]:
+            p = dict(S=S, DEPTH=depth)
+            for name in ("generate_terrain", "generate_terrain_cache", "generate_terrain_local"):
+                f = getattr(pg, name)
+                for use_numpy in ((False,) if name == "generate_terrain" else (False, True)):
+                    cases.append(Case("purepython." + name, dict(p, numpy=use_numpy),
+                        lambda f=f, S=S, depth=depth, use_numpy=use_numpy:
+                            (lambda: _run_pure(f, use_numpy, S, depth)), 1, S*S))
+    return cases
+
+def run_case(case, repeat):
+    """Returns a dict of measurements, or of the error raised by the case."""
+    result = {"name":case.name, "params":case.params}
+    try:
+        f = case.setup()
+        times = []
+        for i in range(repeat):
+            t = time.perf_counter()
+            f()
+            times.append(time.perf_counter() - t)
+        tracemalloc.start()
+        f()
+        result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    except Exception as e:
+        tracemalloc.stop()
+        result["error"] = repr(e)
+        return result
+    result["seconds"] = min(times)
+    result["chunks_per_s"] = case.chunks / result["seconds"]
+    result["pixels_per_s"] = case.pixels / result["seconds"]
+    return result
+
+def compare(results, baseline, threshold):
+    """Returns the list of (id, ratio) of the cases that are slower than in
+    <baseline> by more than <threshold> (e.g. 0.2 for 20%), and prints the
+    comparison of all the cases."""
+    regressions = []
+    for key, r in sorted(results.items()):
+        b = baseline.get(key)
+        if b is None or "seconds" not in b or "seconds" not in r:
+            continue
+        ratio = r["seconds"] / b["seconds"]
+        flag = ""
+        if ratio > 1. + threshold:
+            regressions.append((key, ratio))
+            flag = "  <- REGRESSION"
+        print("%-80s %8.2fx%s" % (key, ratio, flag))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark thornoise2 generators.")
+    parser.add_argument("--quick", action="store_true", help="small sweep")
+    parser.add_argument("--filter", default="", help="only run cases whose id contains this")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", default=None, help="results of a previous run")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative slowdown considered as a regression")
+    args = parser.parse_args(argv)
+    sweep = SWEEPS["quick" if args.quick else "full"]
+    results = {}
+    for case in get_cases(sweep):
+        key = case.get_id()
+        if args.filter not in key:
+            continue
+        r = run_case(case, args.repeat)
+        results[key] = r
+        if "error" in r:
+            print("%-80s ERROR %s" % (key, r["error"]))
+        else:
+            print("%-80s %10.5f s %12.0f px/s %10.1f MB" %
+                  (key, r["seconds"], r["pixels_per_s"], r["peak_bytes"]/2**20))
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=1)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print("\nComparison with", args.baseline, "(time ratio):")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(len(regressions), "regression(s) above", args.threshold)
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+/*
+ *  Zero-gradient D2M1N3 kernel, compiled as a shared library and called from
+ *  Python through ctypes (see numpygen/ckernel.py).
+ *
+ *  Unlike zg.c, the lattice of each octave and the cached rows (relative
+ *  position and smoothstep of each pixel in its cell) are given by the
+ *  caller, so that the result is the one of numpygen.noisegen.generate_terrain
+ *  for the same chunk. Operations are done in the same order as in numpy, so
+ *  the result is identical as long as the compiler does not contract them
+ *  (build with -ffp-contract=off, see the makefile).
+ *
+ *  Use : make libzg.so
+ *
+ * */
+
+typedef double T;
+
+// Adds to <terrain> (S*S, row-major) the octave whose lattice <h> has
+// (n+1)*(n+1) values (row-major). <x> and <sx> are the relative position and
+// smoothstep of the res = S/n pixels of a cell.
+void zgAddOctave(int S, int n, const T* h, const T* x, const T* sx, T* terrain)
+{
+    int res = S/n;
+    for(int cx=0;cx<n;cx++)
+    {
+        for(int cy=0;cy<n;cy++)
+        {
+            //polynom coefficients of the cell (cx,cy)
+            T h0 = h[cx*(n+1) + cy];
+            T dhx = h[(cx+1)*(n+1) + cy] - h0;
+            T dhy = h[cx*(n+1) + cy+1] - h0;
+            T A = dhx - h[(cx+1)*(n+1) + cy+1] + h[cx*(n+1) + cy+1];
+            for(int i=0;i<res;i++)
+            {
+                T xv = x[i];
+                T sxv = sx[i];
+                T* row = terrain + (cx*res + i)*S + cy*res;
+                for(int j=0;j<res;j++)
+                {
+                    T xy = xv*x[j] - x[j]*sxv - xv*sx[j];
+                    row[j] += ((dhx*sxv + dhy*sx[j]) + A*xy) + h0;
+                }
+            }
+        }
+    }
+}
+
+// Same as zgAddOctave for <nOctaves> octaves at once : <ns> gives n for each
+// octave, and <hs>, <xs>, <sxs> are the concatenations of their lattices and
+// rows.
+void zgTerrain(int S, int nOctaves, const int* ns, const T* hs, const T* xs,
+               const T* sxs, T* terrain)
+{
+    for(int k=0;k<nOctaves;k++)
+    {
+        int n = ns[k];
+        int res = S/n;
+        zgAddOctave(S, n, hs, xs, sxs, terrain);
+        hs += (n+1)*(n+1);
+        xs += res;
+        sxs += res;
+    }
+}
@@ -40,17 +40,17 @@ if __name__ == "__main__":
     # c.S = 12
     # c.DOM_DIVIDER = 2 #if you modify this, try adjusting also S and MIN_N
     # c.H_DIVIDER = 1.7
-    # c.WORLD_SIZE = (4,4) #size in number of chunks. The world is a torus.
+    # c.WORLD_SIDE_CHUNKS = (4,4) #size in number of chunks. The world is a torus.
+    # c.LATTICE = "world" #chunk coordinates wrap around the torus
     ##### Then build it and choose a colorscale (optional) ######################
     c.build()
     colormap = colorscale.SUMMER #How height is transformed into color
     init_chunk = (0,230) #any couple of positive integers
-    chunk = np.array(init_chunk)%c.WORLD_SIZE #dont go further than world limit
-    chunk = tuple(init_chunk)
+    chunk = tuple(init_chunk) #with LATTICE "world" or "hash", wraps around the world
     hmap = ng.generate_terrain(chunk, c) #generate actual data
     hmap = ng.normalize(hmap) #scales to [0,1] range
     # hmap = ng.theoretical_normalize(hmap, c) #scales to [0,1] range in a tileable way
-    cmap = colormap.get(hmap) #array of colors
+    cmap = colormap.get_image(hmap) #uint8 array of colors, indexed [x,y] like surfarray
     ##### Optional: visualization using pygame ##################################
     HAS_PYGAME = False
     try:
@@ -146,7 +146,7 @@ def get_seeded_conditions_d2m1n3(truechunk, k, c):
     l,t = truechunk
     prng = RandomState((c.SEED, l,t,n,0))
     tabh = RandArrayPrng(h,n+1,prng)
-    _set_seeded_condition(c.SEED,l,t,tabh,n,h,1,c.WORLD_SIZE)
+    _set_seeded_condition(c.SEED,l,t,tabh,n,h,1,c.WORLD_SIDE_CHUNKS)
     return tabh
 
 
@@ -165,7 +165,7 @@ def get_seeded_conditions(base_seed, truechunk, k, c):
     l,t = truechunk
     prng = RandomState([l,t,n,0]) #bulk
     tabh,tabf,tabg = RandArrayPrng(h,n+1,prng),RandArrayPrng(p,n+1,prng),RandArrayPrng(p,n+1,prng)
-    _set_seeded_condition(base_seed, l,t,tabh,n,h,1,c.WORLD_SIZE)
+    _set_seeded_condition(base_seed, l,t,tabh,n,h,1,c.WORLD_SIDE_CHUNKS)
     return tabh, tabf, tabg
 
 def generate_terrain(chunk, c):
@@ -341,7 +341,7 @@ class Cache:
         self.X = None
         self.Y = None
         #
-        self.WORLD_SIZE = (1,1) #in chunk units
+        self.WORLD_SIDE_CHUNKS = (1,1) #in chunk units
         #
         self.max_h = None #maximum height or depth (goes both above and below 0)
         self.SEED = 0
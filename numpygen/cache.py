@@ -0,0 +1,89 @@
+"""This module provides a memory cache of generated chunks, so that chunks that
+are visited again (e.g. a player walking back and forth across a chunk
+border) are not generated again.
+
+usage :
+    chunks = ChunkCache(max_bytes=256*2**20)
+    hmap = chunks.get((3,4), c) #generated with noisegen.generate_terrain
+    hmap = chunks.get((3,4), c) #hit
+"""
+from collections import OrderedDict
+import threading
+import numpy as np
+
+from . import noisegen as ng
+
+
+class ChunkCache:
+
+    def __init__(self, max_bytes:int=256*2**20, readonly:bool=True,
+                 generator=ng.generate_terrain):
+        """<max_bytes> is the memory budget of the stored heightmaps. Least
+        recently used chunks are evicted when it is exceeded.
+        If <readonly> is True, get returns read-only views of the stored arrays
+        (no copy) ; otherwise it returns writable copies.
+        <generator> is called as generator(chunk, c) on misses."""
+        self.max_bytes = max_bytes
+        self.readonly = readonly
+        self.generator = generator
+        self.entries = OrderedDict() #key -> array, from least to most recently used
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def get_key(chunk:tuple[int,int], c:ng.Cache)->tuple:
+        """Key identifying the chunk : noise type, noise parameters (including
+        SEED) and chunk coordinates."""
+        return (c.__class__.__name__, tuple(c.get_params().items()),
+                tuple(int(v) for v in chunk))
+
+    def get(self, chunk:tuple[int,int], c:ng.Cache)->np.ndarray:
+        """Returns the heightmap of <chunk>, generating it if needed."""
+        key = self.get_key(chunk, c)
+        with self.lock:
+            hmap = self.entries.get(key)
+            if hmap is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if hmap is None:
+            hmap = self.generator(key[2], c)
+            hmap.flags.writeable = False
+            self._store(key, hmap)
+        if self.readonly:
+            return hmap
+        return hmap.copy()
+
+    def _store(self, key, hmap):
+        if hmap.nbytes > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                return
+            self.entries[key] = hmap
+            self.nbytes += hmap.nbytes
+            while self.nbytes > self.max_bytes:
+                _, old = self.entries.popitem(last=False)
+                self.nbytes -= old.nbytes
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+    def get_stats(self)->dict:
+        return {"hits":self.hits, "misses":self.misses,
+                "evictions":self.evictions, "entries":len(self.entries),
+                "nbytes":self.nbytes, "max_bytes":self.max_bytes}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, item):
+        chunk, c = item
+        return self.get_key(chunk, c) in self.entries
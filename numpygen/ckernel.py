@@ -0,0 +1,88 @@
+"""This module calls the compiled zero-gradient kernel of c/zgkernel.c
+through ctypes. The library is optional: build it with 'make libzg.so' in
+the c/ folder (or set the THORNOISE_ZG_LIB environment variable to its
+path). When it is not available, is_available() returns False and
+noisegen.generate_terrain(..., backend="c") falls back to numpy.
+
+Seeding is still done by noisegen, only the evaluation of the polynoms is
+native. The kernel works in float64 and gives exactly the heights of
+noisegen.generate_terrain for ZeroGradient caches.
+
+usage :
+    if ckernel.supports(c):
+        hmap = ckernel.generate_terrain((3,4), c)
+"""
+import ctypes
+import os
+import numpy as np
+
+from . import noisegen as ng
+
+_LIB_NAMES = ("libzg.so", "libzg.dylib", "zg.dll")
+_lib = None
+_loaded = False
+
+def _load():
+    global _lib, _loaded
+    if _loaded:
+        return _lib
+    _loaded = True
+    paths = [os.environ.get("THORNOISE_ZG_LIB")]
+    folder = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "c")
+    paths += [os.path.join(folder, name) for name in _LIB_NAMES]
+    for path in paths:
+        if path and os.path.exists(path):
+            try:
+                lib = ctypes.CDLL(path)
+            except OSError:
+                continue
+            double_p = np.ctypeslib.ndpointer(np.float64, flags="C_CONTIGUOUS")
+            lib.zgTerrain.argtypes = [ctypes.c_int, ctypes.c_int,
+                                      np.ctypeslib.ndpointer(np.intc, flags="C_CONTIGUOUS"),
+                                      double_p, double_p, double_p,
+                                      np.ctypeslib.ndpointer(np.float64, ndim=2,
+                                                             flags=("C_CONTIGUOUS", "WRITEABLE"))]
+            lib.zgTerrain.restype = None
+            _lib = lib
+            break
+    return _lib
+
+def is_available()->bool:
+    """True if the compiled library could be loaded."""
+    return _load() is not None
+
+def supports(c:ng.Cache)->bool:
+    """True if chunks of <c> can be generated by the kernel."""
+    return is_available() and isinstance(c, ng.ZeroGradient) and\
+           np.dtype(c.DTYPE) == np.float64
+
+def _get_rows(c, k): #relative position and smoothstep of the pixels of a cell
+    x = ng.get_x(c.RES[k], 1)[:,0]
+    return x, np.ascontiguousarray(c.get_basis(k, "SMOOTHSTEP_X")[:,0], dtype=np.float64)
+
+def generate_terrain(chunk:tuple[int,int], c:ng.ZeroGradient, out:np.ndarray|None=None,
+                     conditions=ng.get_seeded_conditions)->np.ndarray:
+    """Returns the heightmap of <chunk>, as noisegen.generate_terrain does.
+    If <out> (a C-contiguous (S,S) float64 array) is given, the heightmap is
+    written into it. <conditions> is the seeding function, e.g.
+    noisegen.get_seeded_conditions_d2m1n3 for generate_terrain_d2m1n3."""
+    lib = _load()
+    if lib is None:
+        raise RuntimeError("The zg kernel is not compiled (see c/makefile)")
+    if out is None:
+        out = np.zeros((c.S,c.S))
+    else:
+        out[...] = 0.
+    lattices, xs, sxs = [], [], []
+    for k in c.LEVELS:
+        with ng.stage("seeding", k=k):
+            h = conditions(chunk, k, c)
+            lattices.append(np.ravel(h[0] if isinstance(h, (list, tuple)) else h))
+        x, sx = _get_rows(c, k)
+        xs.append(x)
+        sxs.append(sx)
+    ns = np.array(c.PARAM_N, dtype=np.intc)
+    with ng.stage("evaluation"):
+        lib.zgTerrain(c.S, len(ns), ns, np.concatenate(lattices).astype(np.float64),
+                      np.concatenate(xs), np.concatenate(sxs), out)
+    return out
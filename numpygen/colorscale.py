@@ -1,7 +1,10 @@
 color_t = tuple[int,int,int]
 import numpy as np
 
+from .profiling import stage
+
 class ColorScale: #tricky structure to obtain fast colormap from heightmap
+    NONE = 255 #band index or material id of heights that belong to none
 
     def __init__(self,
                  colors:list[tuple[str, color_t, color_t, float]],
@@ -20,8 +23,129 @@ class ColorScale: #tricky structure to obtain fast colormap from heightmap
             self.colors[i] = [c1,c2,minval,maxval,delta]
             if name:
                 self.materials[name] = self.colors[i]
-
-    def get(self, data):
+        #per band tables for the vectorized get. Pixels belong to the first
+        #band whose max exceeds them, which is also the first band whose max
+        #exceeds the running max of the previous ones (used by searchsorted).
+        self.maxvals = np.maximum.accumulate([M for c1,c2,m,M,delta in self.colors])
+        self.minvals = np.array([m for c1,c2,m,M,delta in self.colors] + [0.])
+        self.deltas = np.array([delta if delta != 0 else 1.
+                                for c1,c2,m,M,delta in self.colors] + [1.])
+        #the extra band is for pixels above all bands, left black
+        self.c1 = np.array([c1 for c1,c2,m,M,delta in self.colors] + [(0,0,0)])
+        self.dc = np.array([np.subtract(c2, c1) if delta != 0 else (0,0,0)
+                            for c1,c2,m,M,delta in self.colors] + [(0,0,0)])
+        self.lut = None
+        #material id of each band (index in self.materials), for get_material_map
+        self.material_ids = np.full(len(self.colors)+1, self.NONE, dtype=np.uint8)
+        for i, band in enumerate(self.materials.values()):
+            self.material_ids[[b is band for b in self.colors] + [False]] = i
+
+    def get(self, data, out=None):
+        """Returns the (w,h,3) array of colors of the heights <data>. If <out>
+        is given (e.g. a (w,h,3) uint8 array), colors are clipped to [0,255]
+        (heights below the first band may extrapolate out of it), written into
+        it and it is returned. Colors are truncated to integers, exactly as
+        get_by_bands does."""
+        with stage("colorization"):
+            colors = self._get_float_colors(data)
+            if out is None:
+                return colors.astype(int)
+            np.copyto(out, np.clip(colors, 0, 255, out=colors), casting="unsafe")
+            return out
+
+    def _get_float_colors(self, data):
+        i = self.get_band_index(data)
+        dmd = (data - self.minvals[i]) / self.deltas[i]
+        return self.c1[i] + dmd[...,None]*self.dc[i]
+
+    def get_band_index(self, data):
+        """Returns the index of the band of each height of <data> in
+        self.colors (len(self.colors) above the last band)."""
+        return np.searchsorted(self.maxvals, data, side="right")
+
+    def build_lut(self, size:int=4096, lo:float=0., hi:float=1.):
+        """Precomputes the colors of <size> heights regularly spaced in
+        [lo, hi], used by get_lut."""
+        heights = np.linspace(lo, hi, size)
+        self.lut = (self.get(heights[None,:])[0].astype(np.uint8), lo, hi)
+
+    def get_lut(self, data, out=None):
+        """Faster version of get for heights in the range given to build_lut
+        (by default [0,1]), using the color of the nearest precomputed height.
+        Heights out of the range get the color of the nearest bound. The
+        result is a uint8 array unless <out> is given.
+        The colors are approximate: within half a step of the table from a
+        band threshold, a height may get the color of the neighbouring band,
+        which can differ completely from that of get. Elsewhere, a channel
+        differs by at most 1 + |c2-c1|*step/(2*delta) for the band of the
+        height (step being (hi-lo)/(size-1)), i.e. 5 in the steepest bands
+        of SUMMER with the default table."""
+        with stage("colorization"):
+            i = self._get_lut_index(data) #builds the table if needed
+            return np.take(self.lut[0], i, axis=0, out=out)
+
+    def _get_lut_index(self, data):
+        if self.lut is None:
+            self.build_lut()
+        lut, lo, hi = self.lut
+        i = (data - lo) * ((len(lut)-1) / (hi - lo)) + 0.5
+        return np.clip(i, 0, len(lut)-1).astype(np.intp)
+
+    @staticmethod
+    def empty_image(shape:tuple[int,int], channels:str="RGB", packed:bool=False,
+                    order:str="C")->np.ndarray:
+        """Returns an uninitialized image for get_image: a (w,h,len(channels))
+        uint8 array, or a (w,h) uint32 array if <packed> is True. <order> is
+        the memory layout, "C" or "F" (for a packed image, or for the pixels
+        of an unpacked one, "F" means that x varies fastest)."""
+        if packed:
+            if len(channels) != 4:
+                raise ValueError("Packed images need 4 channels, got " + channels)
+            return np.empty(shape, dtype=np.uint32, order=order)
+        return np.empty(tuple(shape) + (len(channels),), dtype=np.uint8, order=order)
+
+    def get_image(self, data, channels:str="RGB", packed:bool=False, order:str="C",
+                  transpose:bool=False, out=None, lut:bool=False)->np.ndarray:
+        """Returns the colors of the heights <data> as an image ready for
+        upload, without intermediate integer arrays.
+        <channels> gives the order of the channels in memory, among R, G, B, A
+        (opaque alpha) and X (padding, 255), e.g. "RGB", "BGRA" or "ARGB".
+        If <packed> is True, the 4 channels of a pixel are packed into one
+        uint32 (so "RGBA" gives the value 0xAABBGGRR on little-endian
+        machines). <order> is the memory layout (see empty_image). If
+        <transpose> is True, the image is indexed [y,x] instead of [x,y] like
+        <data> (pygame.surfarray uses [x,y]). The image is written into <out>
+        if given (see empty_image). With <lut> True, colors are taken from the
+        precomputed table of get_lut (approximate at band thresholds, see
+        get_lut) ; otherwise they are exactly those of
+        get(data, out) for a uint8 out."""
+        with stage("colorization"):
+            if transpose:
+                data = data.T
+            if out is None:
+                out = self.empty_image(data.shape, channels, packed, order)
+            pixels = out[...,None].view(np.uint8) if packed else out
+            if lut:
+                i = self._get_lut_index(data)
+                table = self.lut[0]
+            else:
+                band = self.get_band_index(data)
+                dmd = (data - self.minvals[band]) / self.deltas[band]
+            for j, channel in enumerate(channels):
+                if channel in "AX":
+                    pixels[...,j] = 255
+                    continue
+                k = "RGB".index(channel)
+                if lut:
+                    pixels[...,j] = table[i,k]
+                else:
+                    color = self.c1[band,k] + dmd*self.dc[band,k]
+                    np.copyto(pixels[...,j], np.clip(color, 0, 255, out=color),
+                              casting="unsafe")
+            return out
+
+    def get_by_bands(self, data):
+        """Reference implementation of get, band after band."""
         w,h = data.shape
         tot = np.zeros((w,h,3),dtype=int)
         mask = np.zeros((w,h),dtype=bool)
@@ -71,6 +195,54 @@ class ColorScale: #tricky structure to obtain fast colormap from heightmap
             if m <= h < M:
                 return material
     
+    #Array versions of the 3 methods above, for whole heightmaps. Bands are
+    #assumed to be sorted by height, as in all the scales of this module.
+    def get_color_index_map(self, data)->np.ndarray:
+        """Returns the uint8 array of get_color_index_from_h for each height
+        of <data>, with NONE instead of -1."""
+        band = self.get_band_index(data)
+        inside = (band < len(self.colors)) & (data >= self.minvals[band])
+        return np.where(inside, band, self.NONE).astype(np.uint8)
+
+    def get_material_map(self, data)->np.ndarray:
+        """Returns the uint8 array of the ids of the materials of the heights
+        <data>, i.e. their index in list(self.materials), or NONE where
+        get_material_from_h would return None."""
+        band = self.get_color_index_map(data)
+        return self.material_ids[np.minimum(band, len(self.colors))]
+
+    def get_colors_from_h(self, data)->np.ndarray:
+        """Returns the (w,h,3) array of get_color_from_h for each height of
+        <data> (unlike get, heights out of the bands get the second color of
+        the last band)."""
+        colors = self._get_float_colors(data)
+        outside = self.get_color_index_map(data) == self.NONE
+        colors[outside] = self.colors[-1][1]
+        return colors
+
+    def get_material_stats(self, data)->dict:
+        """Returns a dict giving, for each material name, the number of pixels
+        of <data> made of it ("count"), their fraction ("coverage") and their
+        bounding box ("bbox", (xmin, ymin, xmax, ymax) inclusive, or None)."""
+        ids = self.get_material_map(data)
+        n = len(self.materials) + 1 #the last id counts the pixels of no material
+        ids = np.minimum(ids, n-1).astype(np.intp)
+        counts = np.bincount(ids.reshape(-1), minlength=n)
+        w,h = ids.shape
+        #(w,n) and (h,n) tables telling which materials appear in each row and column
+        in_x = np.bincount((np.arange(w)[:,None]*n + ids).reshape(-1), minlength=w*n)
+        in_y = np.bincount((np.arange(h)[None,:]*n + ids).reshape(-1), minlength=h*n)
+        in_x, in_y = in_x.reshape((w,n)) > 0, in_y.reshape((h,n)) > 0
+        stats = {}
+        for i, name in enumerate(self.materials):
+            bbox = None
+            if counts[i]:
+                bbox = (int(in_x[:,i].argmax()), int(in_y[:,i].argmax()),
+                        int(w-1-in_x[::-1,i].argmax()), int(h-1-in_y[::-1,i].argmax()))
+            stats[name] = {"count":int(counts[i]), "coverage":float(counts[i]/ids.size),
+                           "bbox":bbox}
+        return stats
+
     def get_h_material_begin(self, material_name):
         c1, c2, m, M, delta = self.materials[material_name]
         return m
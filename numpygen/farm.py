@@ -0,0 +1,148 @@
+"""This module provides process and thread pools that generate large regions
+of terrain on several cores with numpy and Python3.
+
+Workers build their own cache once, then write the chunks they generate
+directly into a mosaic living in shared memory, so that no array is pickled
+back to the main process. Each chunk only depends on its coordinates and on
+the cache parameters, so the result does not depend on the number of workers.
+
+usage :
+    with ChunkFarm(c, workers=8) as farm:
+        hmap = farm.generate_region((0,0), 32, 32)
+        ... #hmap is only valid until the farm is closed, copy it if needed
+
+Since seeding does not use the global numpy random state (see
+noisegen.get_prng), chunks can also be generated by threads, with
+generate_chunks_threaded. This avoids the startup cost of processes, but the
+speedup is limited to the part of the work done by numpy without the GIL.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+
+from . import noisegen as ng
+
+_worker_cache = None #built once per worker process
+
+def _init_worker(cache_class, params):
+    global _worker_cache
+    _worker_cache = cache_class.from_params(params)
+
+def _work(shm_name, shape, dtype, chunk0, cells):
+    """Generates the chunks at mosaic positions <cells> (list of (i,j)) and
+    writes them into the shared mosaic. Returns the number of chunks."""
+    c = _worker_cache
+    S = c.S
+    chunks = [(chunk0[0]+i, chunk0[1]+j) for i,j in cells]
+    hmaps = ng.generate_chunks(chunks, c)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    mosaic = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    for (i,j), hmap in zip(cells, hmaps):
+        mosaic[i*S:(i+1)*S, j*S:(j+1)*S] = hmap
+    del mosaic
+    shm.close()
+    return len(cells)
+
+def _work_chunks(shm_name, shape, dtype, first, chunks):
+    """Generates <chunks> and writes them into the shared (N,S,S) array from
+    index <first>. Returns the number of chunks."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    out = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    ng.generate_chunks(chunks, _worker_cache, out=out[first:first+len(chunks)])
+    del out
+    shm.close()
+    return len(chunks)
+
+
+class ChunkFarm:
+
+    def __init__(self, c:ng.Cache, workers:int|None=None):
+        """<c> is a cache whose parameters are copied to each worker.
+        <workers> is the number of processes (default: number of cores)."""
+        self.cache_class = c.__class__
+        self.params = c.get_params()
+        self.S = c.S
+        self.dtype = np.dtype(c.DTYPE)
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                        initargs=(self.cache_class, self.params))
+        self.mosaics = [] #shared memory blocks owned by this farm
+
+    def generate_region(self, chunk0:tuple[int,int], width:int, height:int,
+                        chunks_per_task:int|None=None)->np.ndarray:
+        """Returns a (width*S, height*S) array containing the <width> times
+        <height> chunks starting at chunk <chunk0>. The array lives in shared
+        memory and is valid until the farm is closed.
+        A task is a group of <chunks_per_task> consecutive chunks with the
+        same first index, i.e. of a column as in stream.py (default: one
+        column of <height> chunks), which share their seeded edges."""
+        S = self.S
+        shape = (width*S, height*S)
+        shm = shared_memory.SharedMemory(create=True,
+                                         size=max(1, width*height*S*S*self.dtype.itemsize))
+        self.mosaics.append(shm)
+        if chunks_per_task is None:
+            chunks_per_task = height
+        tasks = []
+        for i in range(width):
+            for j in range(0, height, chunks_per_task):
+                cells = [(i,jj) for jj in range(j, min(j+chunks_per_task, height))]
+                tasks.append(cells)
+        futures = [self.pool.submit(_work, shm.name, shape, self.dtype, chunk0, cells)
+                   for cells in tasks]
+        for future in futures:
+            future.result() #propagates worker exceptions
+        return np.ndarray(shape, dtype=self.dtype, buffer=shm.buf)
+
+    def generate_chunks(self, chunks, chunks_per_task:int=8)->np.ndarray:
+        """Returns a (N,S,S) array whose i-th item is the heightmap of
+        chunks[i], as noisegen.generate_chunks does. Unlike generate_region,
+        the result is an ordinary array, valid after the farm is closed."""
+        chunks = [(int(l), int(t)) for l,t in chunks]
+        shape = (len(chunks), self.S, self.S)
+        shm = shared_memory.SharedMemory(create=True,
+                                         size=max(1, len(chunks)*self.S*self.S*self.dtype.itemsize))
+        try:
+            futures = [self.pool.submit(_work_chunks, shm.name, shape, self.dtype,
+                                        i, chunks[i:i+chunks_per_task])
+                       for i in range(0, len(chunks), chunks_per_task)]
+            for future in futures:
+                future.result()
+            out = np.ndarray(shape, dtype=self.dtype, buffer=shm.buf).copy()
+        finally:
+            shm.close()
+            shm.unlink()
+        return out
+
+    def close(self):
+        """Stops the workers and frees the shared memory. Arrays returned by
+        generate_region must not be used after this call."""
+        self.pool.shutdown()
+        for shm in self.mosaics:
+            try:
+                shm.close()
+            except BufferError: #still referenced by the caller, freed with it
+                pass
+            shm.unlink()
+        self.mosaics = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def generate_chunks_threaded(chunks, c:ng.Cache, workers:int|None=None,
+                             out:np.ndarray|None=None)->np.ndarray:
+    """Same as noisegen.generate_chunks, but chunks are generated by a pool of
+    <workers> threads (default: number of cores)."""
+    chunks = [(int(l), int(t)) for l,t in chunks]
+    if out is None:
+        out = np.zeros((len(chunks),c.S,c.S), dtype=c.DTYPE)
+    def work(i):
+        out[i] = ng.generate_terrain(chunks[i], c)
+    with ThreadPoolExecutor(workers or os.cpu_count() or 1) as pool:
+        list(pool.map(work, range(len(chunks))))
+    return out
@@ -6,10 +6,15 @@ Since it aims at performance, the code is more complex that strictly necessary f
 understanding the noise. One should use the pure python version if the performance
 is not crucial.
 """
+from collections import OrderedDict
 from functools import lru_cache
+import threading
 import numpy as np
 
+from .profiling import profile, stage #see profiling.py
+
 class PolynomZG: #zero-gradient D2M1N3 polynom (see article)
+    lattices = (0,) #flags of the lattices used among h (0), f (1) and g (2)
 
     def __init__(self, h, f, g): #h is a 2*2 array containing imposed heights
         self.h0 = h[0,0]
@@ -30,7 +35,38 @@ class PolynomZG: #zero-gradient D2M1N3 polynom (see article)
         y0 *= res
         a[x0:x0+res,y0:y0+res] += self.domain_eval(c, k)
 
+    #Vectorized versions of __init__ and domain_eval, working on the cells of
+    #a whole lattice at once (see fill_octave and generate_window).
+    @staticmethod
+    def cell_coeffs(h, f, g): #(...,n+1,n+1) lattices -> tuple of (...,n,n) coefficients
+        h0 = h[...,:-1,:-1]
+        dhx = h[...,1:,:-1] - h0
+        dhy = h[...,:-1,1:] - h0
+        A = dhx - h[...,1:,1:] + h[...,:-1,1:]
+        return dhx, dhy, A, h0
+
+    @staticmethod
+    def eval_coeffs(cf, c, k, basis): #basis(name) is the cached space <name> (see Cache.get_basis), shaped like cf
+        dhx, dhy, A, h0 = cf
+        result = dhx*basis("SMOOTHSTEP_X") +\
+                 dhy*basis("SMOOTHSTEP_Y") +\
+                 A*basis("XY") +\
+                 h0
+        return result
+
+    @classmethod
+    def fill_octave(cls, a, c, k, h, f, g, step=1): #vectorized fill_array for every cell of level k at once
+        #with step > 1, only one pixel every <step> is evaluated (see generate_terrain)
+        with stage("coefficients", k=k):
+            cf = [_cells(coeff) for coeff in cls.cell_coeffs(h, f, g)]
+        with stage("evaluation", k=k):
+            basis = lambda name:_basis(c.get_basis(k, name)[::step,::step])
+            block = cls.eval_coeffs(cf, c, k, basis)
+        with stage("accumulation", k=k):
+            _add_cells(a, block)
+
 class PolynomNoiseCache(PolynomZG):
+    lattices = (0,1,2)
 
     def __init__(self, h, f, g):
         A = h[0,1] + h[1,0] - h[0,0] - h[1,1]
@@ -73,7 +109,48 @@ class PolynomNoiseCache(PolynomZG):
         y0 *= res
         a[x0:x0+res,y0:y0+res] += self.domain_eval(c, k) * c.PARAM_H[k]
 
+    @staticmethod
+    def cell_coeffs(h, f, g):
+        h00, h10, h01, h11 = h[...,:-1,:-1], h[...,1:,:-1], h[...,:-1,1:], h[...,1:,1:]
+        f00, f10, f01, f11 = f[...,:-1,:-1], f[...,1:,:-1], f[...,:-1,1:], f[...,1:,1:]
+        g00, g10, g01, g11 = g[...,:-1,:-1], g[...,1:,:-1], g[...,:-1,1:], g[...,1:,1:]
+        A = h01 + h10 - h00 - h11
+        c00 = h00
+        c10 = f00
+        c01 = g00
+        #
+        c20 = 3.*(h10-h00) - 2.*f00 - f10
+        c02 = 3.*(h01-h00) - 2.*g00 - g01
+        c30 = f10 + f00 - 2.*(h10-h00)
+        c03 = g01 + g00 - 2.*(h01-h00)
+        c11 = A + g10 + f01 - g00 - f00
+        #
+        c31 = f11 + f01 - 2.*(h11-h01) - c30
+        c13 = g11 + g10 - 2.*(h11-h10) - c03
+        #
+        c21 = 3.*(h11-h01) - 2.*f01 - f11 - c20
+        c12 = 3.*(h11-h10) - 2.*g10 - g11 - c02
+        return c00, c10, c20, c30, c01, c02, c03, c11, c21, c31, c12, c13
+
+    @staticmethod
+    def eval_coeffs(cf, c, k, basis):
+        c00, c10, c20, c30, c01, c02, c03, c11, c21, c31, c12, c13 = cf
+        result = c00 + \
+                 c10*basis((1,0)) +\
+                 c20*basis((2,0)) +\
+                 c30*basis((3,0)) +\
+                 c01*basis((0,1)) +\
+                 c02*basis((0,2)) +\
+                 c03*basis((0,3)) +\
+                 c11*basis((1,1)) +\
+                 c21*basis((2,1)) +\
+                 c31*basis((3,1)) +\
+                 c12*basis((1,2)) +\
+                 c13*basis((1,3))
+        return result * c.PARAM_H[k]
+
 class PolynomPerlin(PolynomZG):
+    lattices = (1,2)
 
     def __init__(self, h, f, g):
         self.f = f
@@ -95,10 +172,45 @@ class PolynomPerlin(PolynomZG):
         x0 *= res
         y0 *= res
         a[x0:x0+res,y0:y0+res] += self.domain_eval(c,k) * c.PARAM_H[k]
-        
+
+    @staticmethod
+    def cell_coeffs(h, f, g):
+        f00, f10, f01, f11 = f[...,:-1,:-1], f[...,1:,:-1], f[...,:-1,1:], f[...,1:,1:]
+        g00, g10, g01, g11 = g[...,:-1,:-1], g[...,1:,:-1], g[...,:-1,1:], g[...,1:,1:]
+        return f00, f10, f01, f11, g00, g10, g01, g11
+
+    @staticmethod
+    def eval_coeffs(cf, c, k, basis):
+        f00, f10, f01, f11, g00, g10, g01, g11 = cf
+        X, Y, XM1, YM1 = basis("X"), basis("Y"), basis("XM1"), basis("YM1")
+        SX, SY = basis("SMOOTHSTEP_X"), basis("SMOOTHSTEP_Y")
+        topleft = f00*X + g00*Y
+        topright = f10*XM1 + g10*Y
+        bottomleft = f01*X + g01*YM1
+        bottomright = f11*XM1 + g11*YM1
+        #
+        htop = topleft + SX * (topright - topleft)
+        hbottom = bottomleft + SX * (bottomright - bottomleft)
+        hmiddle = htop + SY * (hbottom-htop)
+        return hmiddle * c.PARAM_H[k]
+
+#Helpers for fill_octave. Leading dimensions (e.g. a batch of chunks) are kept.
+def _cells(coeffs): #(...,nx,ny) array of per-cell coefficients -> broadcastable (...,nx,1,ny,1)
+    return coeffs[...,:,None,:,None]
+
+def _basis(b): #(res,res) cached basis -> broadcastable (1,res,1,res)
+    return b[None,:,None,:]
+
+def _add_cells(a, block): #add a (...,nx,res,ny,res) block to the top-left corner of a
+    nx, res, ny, _ = block.shape[-4:]
+    a[...,:nx*res,:ny*res] += block.reshape(block.shape[:-4] + (nx*res, ny*res))
+
 
 class Cache:
     name = "Abstract cache"
+    #user-defined attributes that fully determine the generated noise
+    PARAMS = ("DEPTH", "H_DIVIDER", "DOM_DIVIDER", "MIN_N", "S", "SEED",
+              "WORLD_SIDE_CHUNKS", "PRNG", "LATTICE", "DTYPE")
 
     def __init__(self):
         #Scale parameters (impact on fractal behaviour)
@@ -115,10 +227,23 @@ class Cache:
         self.X = None
         self.Y = None
         #
-        self.WORLD_SIDE_CHUNKS = (1,1) #in chunk units
+        self.WORLD_SIDE_CHUNKS = (1,1) #in chunk units, see LATTICE. None: no wrapping
         #
         self.max_h = None #maximum height or depth (goes both above and below 0)
         self.SEED = 0
+        self.PRNG = "legacy" #seeding backend, see get_prng
+        #"seeded", "world" (see get_world_lattice) or "hash" (see hash_lattice).
+        #With "world" and "hash", the world is a torus of WORLD_SIDE_CHUNKS
+        #chunks: chunk coordinates wrap around. With "seeded", only the edges
+        #of the chunks 0 <= l,t < WORLD_SIDE_CHUNKS wrap. With None, nothing
+        #wraps (not for "world"). "hash" refuses the default (1,1), for which
+        #all chunks would be the same.
+        self.LATTICE = "seeded"
+        self.DTYPE = "float64" #type of the cached spaces
+        self.COMPACT = False #if True, spaces are only built when needed, see get_basis
+        self.spaces = None #cached spaces of each level, by name
+        self.lattice_memo = None #optional LatticeMemo, see get_seeded_conditions
+        self.world_lattices = None #lattices of the whole world, see get_world_lattice
 
     def build_params(self):
         #Derived parameters
@@ -135,6 +260,13 @@ class Cache:
             n *= self.DOM_DIVIDER
         assert self.MIN_N > 0
         assert self.PARAM_N[-1] <= self.S
+        if self.LATTICE == "hash" and self.WORLD_SIDE_CHUNKS is not None and\
+           tuple(self.WORLD_SIDE_CHUNKS) == (1,1):
+            #every chunk would be the same
+            raise ValueError('LATTICE "hash" needs WORLD_SIDE_CHUNKS = None (unbounded '
+                             'world) or the size of the world, not (1,1)')
+        if self.LATTICE == "world":
+            _check_world_size(self)
         self.max_h = self.compute_max_h()
 
 
@@ -162,8 +294,10 @@ class Cache:
 ##        for k in self.LEVELS:
 ##            self.RES.append(int(self.S / self.PARAM_N[k])) #resolution of domain at level k
 
-    def get_x(self,k):
-        return get_x(self.RES[k])
+    def get_x(self,k): #in DTYPE, so that the spaces built from it are too
+        if self.COMPACT: #(res,1) column, the other ones being equal
+            return get_x(self.RES[k], 1).astype(self.DTYPE, copy=False)
+        return get_x(self.RES[k]).astype(self.DTYPE, copy=False)
 ##    def get_x(self, k): #used for builing cache (see below)
 ##        res = self.RES[k]
 ##        domain = np.arange(0., 1., 1./res)
@@ -172,6 +306,34 @@ class Cache:
 ##            a[x,:] = domain[x]
 ##        return a
 
+    def get_basis(self, k, name):
+        """Returns the cached space <name> of level k, where name is the name of
+        a list attribute like "SMOOTHSTEP_X", or a key (i,j) of XiYj.
+        The result can be broadcast to (res,res). In COMPACT mode, spaces are
+        computed on first use only, and those depending on one coordinate are
+        kept as (res,1) or (1,res) arrays, with the same values."""
+        space = self.spaces[k].get(name)
+        if space is None:
+            if self.COMPACT:
+                x = self.get_x(k)
+                space = self.get_basis_at(x, x.T, name)
+            elif isinstance(name, tuple):
+                space = self.XiYj[k][name]
+            else:
+                space = getattr(self, name)[k]
+            space = space.astype(self.DTYPE, copy=False)
+            self.spaces[k][name] = space
+        return space
+
+    def get_basis_at(self, u, v, name):
+        """Same as get_basis, but evaluated at relative positions <u>, <v>
+        (arrays in [0,1[) in the cell instead of the cached pixel grid."""
+        if name == "X":
+            return u
+        elif name == "Y":
+            return v
+        raise KeyError(name)
+
     def build_cache(self):
         self.X, self.Y = [], []
         for k in self.LEVELS:
@@ -182,11 +344,33 @@ class Cache:
     def build(self):
         self.build_params()
         print("Start building cache:", self.name, end="")
-        self.build_cache()
+        self.spaces = [{} for k in self.LEVELS]
+        self.world_lattices = {}
+        if not self.COMPACT:
+            self.build_cache()
         print("... cache built.")
 
+    def get_params(self)->dict:
+        """Returns the values of the attributes listed in PARAMS. DTYPE is
+        given by its name (e.g. "float32" for np.float32), so that equal
+        parameters always give equal values."""
+        params = {name:getattr(self, name) for name in self.PARAMS}
+        params["DTYPE"] = np.dtype(self.DTYPE).name
+        return params
+
+    @classmethod
+    def from_params(cls, params:dict):
+        """Returns a built cache of this class using <params> (as returned by
+        get_params)."""
+        c = cls()
+        for name, value in params.items():
+            setattr(c, name, value)
+        c.build()
+        return c
+
 class ZeroGradient(Cache):
     name = "ZG cache"
+    PARAMS = Cache.PARAMS + ("sdegree",)
     polynom = PolynomZG
 
     def __init__(self):
@@ -209,6 +393,16 @@ class ZeroGradient(Cache):
             self.SMOOTHSTEP_Y.append(sy)
             self.XY.append(x*y - y*sx - x*sy)
 
+    def get_basis_at(self, u, v, name):
+        if name == "SMOOTHSTEP_X":
+            return smoothstep[self.sdegree](u)
+        elif name == "SMOOTHSTEP_Y":
+            return smoothstep[self.sdegree](v)
+        elif name == "XY":
+            su, sv = smoothstep[self.sdegree](u), smoothstep[self.sdegree](v)
+            return u*v - v*su - u*sv
+        return Cache.get_basis_at(self, u, v, name)
+
 class NoiseCache(Cache):
     name = "NoiseCache D2M1N3 cache"
     polynom = PolynomNoiseCache
@@ -230,9 +424,20 @@ class NoiseCache(Cache):
                     dictij[(i,j)] = (x**i) * (y**j)
             self.XiYj.append(dictij)
 
+    def get_basis_at(self, u, v, name):
+        if isinstance(name, tuple):
+            i,j = name
+            if j == 0: #same values as (u**i) * 1., without broadcasting to v
+                return u**i
+            elif i == 0:
+                return v**j
+            return (u**i) * (v**j)
+        return Cache.get_basis_at(self, u, v, name)
+
 
 class Perlin(Cache):
     name = "Perlin cache"
+    PARAMS = Cache.PARAMS + ("sdegree",)
     polynom = PolynomPerlin
 
     def __init__(self):
@@ -260,30 +465,274 @@ class Perlin(Cache):
             self.XM1.append(xm1)
             self.YM1.append(xm1.T)
 
-def RandArray(c, n): #return rand array with values comprised in [0, n[
-    return c*(2*np.random.random((n,n)) - 1)
+    def get_basis_at(self, u, v, name):
+        if name == "SMOOTHSTEP_X":
+            return smoothstep[self.sdegree](u)
+        elif name == "SMOOTHSTEP_Y":
+            return smoothstep[self.sdegree](v)
+        elif name == "XM1":
+            return u - 1.
+        elif name == "YM1":
+            return v - 1.
+        return Cache.get_basis_at(self, u, v, name)
+
+_local = threading.local() #per-thread random generators (see get_prng)
+_MASK64 = 2**64 - 1
+
+def _splitmix64(x):
+    x = (x + 0x9E3779B97F4A7C15) & _MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+def _philox_key(key): #tuple of ints (possibly negative) -> 2 words Philox key
+    k = len(key)
+    for v in key:
+        k = _splitmix64(k ^ (v & _MASK64))
+    return np.array([k, _splitmix64(k)], dtype=np.uint64)
+
+def get_prng(key, kind="legacy"):
+    """Returns a random generator seeded with <key> (a tuple of ints), that
+    belongs to the calling thread. The global np.random state is never used,
+    so that chunks can be generated from several threads.
+    kind="legacy" gives exactly the values of np.random.seed(key) (existing
+    worlds don't change). kind="philox" uses a counter-based np.random.Generator
+    that is faster to seed and accepts negative chunk coordinates, but gives
+    different worlds."""
+    if kind == "legacy":
+        prng = getattr(_local, "legacy", None)
+        if prng is None:
+            prng = _local.legacy = np.random.RandomState()
+        prng.seed(key)
+        return prng
+    elif kind == "philox":
+        prng = getattr(_local, "philox", None)
+        if prng is None:
+            prng = _local.philox = np.random.Generator(np.random.Philox(0))
+        #resetting the state is much cheaper than building a new generator
+        prng.bit_generator.state = {"bit_generator":"Philox",
+                                    "state":{"counter":np.zeros(4, np.uint64),
+                                             "key":_philox_key(key)},
+                                    "buffer":np.zeros(4, np.uint64),
+                                    "buffer_pos":4, "has_uint32":0, "uinteger":0}
+        return prng
+    raise ValueError("Unknown PRNG kind: " + str(kind))
+
+def RandArray(c, n, prng=np.random): #return rand array with values comprised in [0, n[
+    return c*(2*prng.random((n,n)) - 1)
+
+
+class LatticeMemo:
+    """Bounded memo of the raw random draws behind the seeded lattices, so
+    that revisiting a chunk (with another noise type, lod or window) or
+    generating its neighbours does not seed random generators again.
+    Bulk grids and edges are stored separately: an edge is keyed like its
+    seed (c.SEED, l, t, n, flag, side) and is thus found by both chunks
+    sharing it. Draws do not depend on the amplitude of the level, which is
+    applied afterwards, so the memo can be shared by caches differing in
+    H_DIVIDER or noise type. It is thread-safe.
+
+    usage :
+        c.lattice_memo = LatticeMemo(max_bytes=64*2**20)
+    """
+
+    def __init__(self, max_bytes:int=64*2**20, max_edge_bytes:int=16*2**20):
+        """<max_bytes> and <max_edge_bytes> are the memory budgets of the
+        grids and of the edges. Least recently used draws are evicted."""
+        self.tables = {"grid":OrderedDict(), "edge":OrderedDict()}
+        self.max_bytes = {"grid":max_bytes, "edge":max_edge_bytes}
+        self.nbytes = {"grid":0, "edge":0}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
 
-def _set_seeded_condition(seed, l, t, a, n, val, flag, ws):
+    def _get(self, table, key, draw):
+        entries = self.tables[table]
+        with self.lock:
+            value = entries.get(key)
+            if value is not None:
+                entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+        value = draw()
+        nbytes = np.asarray(value).nbytes
+        with self.lock:
+            if key not in entries and nbytes <= self.max_bytes[table]:
+                entries[key] = value
+                self.nbytes[table] += nbytes
+                while self.nbytes[table] > self.max_bytes[table]:
+                    _, old = entries.popitem(last=False)
+                    self.nbytes[table] -= np.asarray(old).nbytes
+        return value
+
+    def get_grids(self, key, n, count, kind="legacy"):
+        """Returns the <count> (n,n) arrays drawn one after the other after
+        seeding with <key>."""
+        def draw():
+            prng = get_prng(key, kind)
+            grids = np.array([prng.random((n,n)) for i in range(count)])
+            grids.flags.writeable = False
+            return grids
+        return self._get("grid", (kind, key, n, count), draw)
+
+    def get_edge(self, key, size, kind="legacy"):
+        """Returns prng.random(size) drawn right after seeding with <key>."""
+        def draw():
+            edge = get_prng(key, kind).random(size)
+            if size is not None:
+                edge.flags.writeable = False
+            return edge
+        return self._get("edge", (kind, key, size), draw)
+
+    def clear(self):
+        with self.lock:
+            for table in self.tables:
+                self.tables[table].clear()
+                self.nbytes[table] = 0
+
+    def get_stats(self)->dict:
+        return {"hits":self.hits, "misses":self.misses,
+                "grids":len(self.tables["grid"]), "edges":len(self.tables["edge"]),
+                "nbytes":sum(self.nbytes.values())}
+
+
+def _seeded_random(key, size, val, memo=None, kind="legacy", lattice=None):
+    """Returns val*(2*random-1) drawn right after seeding with <key>. If <memo>
+    is a dict, the draw is shared with any other call using the same key (e.g.
+    the common edge of two neighbouring chunks). <lattice> is an optional
+    LatticeMemo."""
+    if memo is not None and (key, val) in memo:
+        return memo[(key, val)]
+    if lattice is not None:
+        raw = lattice.get_edge(key, size, kind)
+    else:
+        raw = get_prng(key, kind).random(size)
+    result = val*(2*raw - 1)
+    if memo is not None:
+        memo[(key, val)] = result
+    return result
+
+def _set_seeded_condition(seed, l, t, a, n, val, flag, ws, memo=None, kind="legacy",
+                          lattice=None):
     #lines (can be optimized, corners don't need to be set here...)
-    right = (l+1)%ws[0]
-    bottom = (t+1)%ws[1]
-    np.random.seed((seed, l,t,n,flag,0)) #left
-    a[0,:] = val*(2*np.random.random(n+1) - 1)
-    np.random.seed((seed, right,t,n,flag,0)) #right
-    a[n,:] = val*(2*np.random.random(n+1) - 1)
-    np.random.seed((seed, l,t,n,flag,1)) #top
-    a[:,0] = val*(2*np.random.random(n+1) - 1)
-    np.random.seed((seed, l,bottom,n,flag,1)) #bottom
-    a[:,n] = val*(2*np.random.random(n+1) - 1)
+    if ws is None: #unbounded world
+        right, bottom = l+1, t+1
+    else:
+        right = (l+1)%ws[0]
+        bottom = (t+1)%ws[1]
+    args = (memo, kind, lattice)
+    a[0,:] = _seeded_random((seed, l,t,n,flag,0), n+1, val, *args) #left
+    a[n,:] = _seeded_random((seed, right,t,n,flag,0), n+1, val, *args) #right
+    a[:,0] = _seeded_random((seed, l,t,n,flag,1), n+1, val, *args) #top
+    a[:,n] = _seeded_random((seed, l,bottom,n,flag,1), n+1, val, *args) #bottom
     #corners
-    np.random.seed((seed, l,t,n,flag)) #topleft
-    a[0,0] = val*(2*np.random.random() - 1)
-    np.random.seed((seed, right,t,n,flag)) #topright
-    a[n,0] = val*(2*np.random.random() - 1)
-    np.random.seed((seed, l,bottom,n,flag)) #bottomleft
-    a[0,n] = val*(2*np.random.random() - 1)
-    np.random.seed((seed, right,bottom,n,flag)) #bottomright
-    a[n,n] = val*(2*np.random.random() - 1)
+    a[0,0] = _seeded_random((seed, l,t,n,flag), None, val, *args) #topleft
+    a[n,0] = _seeded_random((seed, right,t,n,flag), None, val, *args) #topright
+    a[0,n] = _seeded_random((seed, l,bottom,n,flag), None, val, *args) #bottomleft
+    a[n,n] = _seeded_random((seed, right,bottom,n,flag), None, val, *args) #bottomright
+
+def _splitmix64_array(x): #vectorized _splitmix64, x is a uint64 array
+    x = x + 0x9E3779B97F4A7C15
+    x = (x ^ (x >> 30)) * 0xBF58476D1CE4E5B9
+    x = (x ^ (x >> 27)) * 0x94D049BB133111EB
+    return x ^ (x >> 31)
+
+def hash_lattice(c, k, x, y, flag):
+    """Returns the values in [-1,1[ of the lattice of level <k> at global
+    lattice coordinates <x>, <y> (broadcastable int arrays) for noise <flag>
+    (0 for heights, 1 and 2 for gradients).
+    No random generator is seeded: each value is a hash of
+    (c.SEED, k, flag, x, y), so any set of points costs one numpy expression
+    and neighbouring chunks agree on their common edges. The lattice wraps
+    around after c.WORLD_SIDE_CHUNKS chunks, unless it is None."""
+    n = c.PARAM_N[k]
+    x = np.asarray(x, dtype=np.int64)
+    y = np.asarray(y, dtype=np.int64)
+    if c.WORLD_SIDE_CHUNKS is not None:
+        x = x % (c.WORLD_SIDE_CHUNKS[0]*n)
+        y = y % (c.WORLD_SIDE_CHUNKS[1]*n)
+    z = _splitmix64((_splitmix64(c.SEED & _MASK64) ^ k) * 3 + flag)
+    z = _splitmix64_array(x.astype(np.uint64) ^ np.uint64(z))
+    z = _splitmix64_array(y.astype(np.uint64) ^ z)
+    return (z >> 11) * (2./2**53) - 1.
+
+def get_hashed_conditions(truechunk, k, c):
+    """Same as get_seeded_conditions, using hash_lattice instead of seeded
+    random generators (when c.LATTICE is "hash")."""
+    n = c.PARAM_N[k]
+    l,t = truechunk
+    x = l*n + np.arange(n+1)[:,None]
+    y = t*n + np.arange(n+1)[None,:]
+    tabh = c.PARAM_H[k]*hash_lattice(c, k, x, y, 0)
+    tabf = hash_lattice(c, k, x, y, 1)
+    tabg = hash_lattice(c, k, x, y, 2)
+    return tabh.astype(c.DTYPE), tabf.astype(c.DTYPE), tabg.astype(c.DTYPE)
+
+_world_lock = threading.Lock()
+#Max memory taken by the lattices of a world with LATTICE "world". Bigger
+#worlds should use LATTICE "hash", which stores nothing.
+WORLD_LATTICE_MAX_BYTES = 2**30
+
+def get_world_lattice_nbytes(c)->int:
+    """Returns the memory taken by the lattices of all the levels of the
+    world of <c> with LATTICE "world" (3 lattices per level, see
+    get_world_lattice)."""
+    W, H = c.WORLD_SIDE_CHUNKS
+    return sum(3*W*H*n*n for n in c.PARAM_N) * np.dtype(c.DTYPE).itemsize
+
+def _check_world_size(c):
+    if c.WORLD_SIDE_CHUNKS is None:
+        raise ValueError('LATTICE "world" needs the size of the world in '
+                         'WORLD_SIDE_CHUNKS, not None')
+    nbytes = get_world_lattice_nbytes(c)
+    if nbytes > WORLD_LATTICE_MAX_BYTES:
+        raise ValueError('The lattices of a world of %s chunks would take %d MB, '
+                         'more than WORLD_LATTICE_MAX_BYTES (%d MB): use LATTICE '
+                         '"hash" or raise the limit'
+                         % (tuple(c.WORLD_SIDE_CHUNKS), nbytes//2**20,
+                            WORLD_LATTICE_MAX_BYTES//2**20))
+
+def get_world_lattice(c, k, seeded):
+    """Returns the lattices of level <k> of the whole world, as a list of
+    (W*n,H*n) arrays (W,H = c.WORLD_SIDE_CHUNKS and n = c.PARAM_N[k]) such
+    that the lattice of chunk (l,t) is the (n+1,n+1) slice starting at
+    (l*n,t*n), wrapping around. <seeded> is the function giving the lattices
+    of one chunk (_seeded_conditions or _seeded_conditions_d2m1n3).
+    The world is built the first time, by seeding each chunk once, and kept
+    in c.world_lattices until c.build() is called again. The height lattice
+    of each chunk is then exactly the seeded one. The gradient lattices of
+    NoiseCache and Perlin, which are not seeded on the edges, are taken from
+    the chunk they start, so that neighbouring chunks agree on them.
+    Raises ValueError if the world would take more than
+    WORLD_LATTICE_MAX_BYTES (see get_world_lattice_nbytes)."""
+    key = (seeded, k)
+    tabs = c.world_lattices.get(key)
+    if tabs is None:
+        with _world_lock:
+            tabs = c.world_lattices.get(key)
+            if tabs is None:
+                _check_world_size(c)
+                W, H = c.WORLD_SIDE_CHUNKS
+                n = c.PARAM_N[k]
+                memo = {} #edges shared by neighbouring chunks are drawn once
+                for l in range(W):
+                    for t in range(H):
+                        chunk_tabs = seeded((l,t), k, c, memo)
+                        if tabs is None:
+                            tabs = [np.empty((W*n,H*n), dtype=tab.dtype) for tab in chunk_tabs]
+                        for world, tab in zip(tabs, chunk_tabs):
+                            world[l*n:(l+1)*n, t*n:(t+1)*n] = tab[:n,:n]
+                c.world_lattices[key] = tabs
+    return tabs
+
+def get_world_conditions(truechunk, k, c, seeded):
+    """Returns the lattices of <truechunk> sliced from get_world_lattice."""
+    n = c.PARAM_N[k]
+    W, H = c.WORLD_SIDE_CHUNKS
+    x = (truechunk[0]*n + np.arange(n+1)) % (W*n)
+    y = (truechunk[1]*n + np.arange(n+1)) % (H*n)
+    return [world[np.ix_(x,y)] for world in get_world_lattice(c, k, seeded)]
 
 def get_seeded_conditions_d2m1n3(truechunk, k, c):
     """This function (along with _set_seeded_condition) is used in order to
@@ -293,85 +742,429 @@ def get_seeded_conditions_d2m1n3(truechunk, k, c):
     returned arrays.
     It is really not optimal to use this version for D2M1N3, as only <tabh> is
     used, and other arrays are ignored."""
+    if c.LATTICE == "hash":
+        n = c.PARAM_N[k]
+        cx,cy = truechunk
+        x = cx*n + np.arange(n+1)[:,None]
+        y = cy*n + np.arange(n+1)[None,:]
+        return (c.PARAM_H[k]*hash_lattice(c, k, x, y, 0)).astype(c.DTYPE)
+    elif c.LATTICE == "world":
+        return get_world_conditions(truechunk, k, c, _seeded_conditions_d2m1n3)[0]
+    return _seeded_conditions_d2m1n3(truechunk, k, c)[0]
+
+def _seeded_conditions_d2m1n3(truechunk, k, c, memo=None):
     n = c.PARAM_N[k]
     h = c.PARAM_H[k]
     cx,cy = truechunk
     # print((c.SEED, cx,cy,n,0))
-    np.random.seed((c.SEED, cx,cy,n,0)) #bulk
-    tabh = RandArray(h,n+1)
-    _set_seeded_condition(c.SEED,cx,cy,tabh,n,h,1,c.WORLD_SIDE_CHUNKS)
-    return tabh
+    if c.lattice_memo is not None:
+        tabh = h*(2*c.lattice_memo.get_grids((c.SEED, cx,cy,n,0), n+1, 1, c.PRNG)[0] - 1)
+    else:
+        prng = get_prng((c.SEED, cx,cy,n,0), c.PRNG) #bulk
+        tabh = RandArray(h,n+1,prng)
+    _set_seeded_condition(c.SEED,cx,cy,tabh,n,h,1,c.WORLD_SIDE_CHUNKS,memo,c.PRNG,
+                          c.lattice_memo)
+    return [tabh.astype(c.DTYPE, copy=False)]
 
 
 
-def get_seeded_conditions(truechunk, k, c):
+def get_seeded_conditions(truechunk, k, c, memo=None):
     """This function (along with _set_seeded_condition) is used in order to
     guaranty that the produced data will always be the same for a given position
     in space and for a given seed.
     A really minimalist code could just use pure random array instead of the
     returned arrays.
     It is really not optimal to use this version for D2M1N3, as only <tabh> is
-    used, and other arrays are ignored."""
+    used, and other arrays are ignored.
+    <memo> is an optional dict shared between calls to reuse edge values (see
+    generate_chunks). If c.lattice_memo is a LatticeMemo, random draws are
+    also reused from it."""
+    if c.LATTICE == "hash":
+        return get_hashed_conditions(truechunk, k, c)
+    elif c.LATTICE == "world":
+        return get_world_conditions(truechunk, k, c, _seeded_conditions)
+    return _seeded_conditions(truechunk, k, c, memo)
+
+def _seeded_conditions(truechunk, k, c, memo=None):
     n = c.PARAM_N[k]
     h = c.PARAM_H[k]
     p = 1.
     l,t = truechunk
-    np.random.seed([l,t,n,0]) #bulk
-    tabh,tabf,tabg = RandArray(h,n+1),RandArray(p,n+1),RandArray(p,n+1)
-    _set_seeded_condition(c.SEED, l,t,tabh,n,h,1,c.WORLD_SIDE_CHUNKS)
-    return tabh, tabf, tabg
+    #the legacy bulk key lacks the seed, which only changes the edges: it is
+    #kept so that existing worlds don't change
+    key = (l,t,n,0) if c.PRNG == "legacy" else (c.SEED,l,t,n,0)
+    if c.lattice_memo is not None:
+        grids = c.lattice_memo.get_grids(key, n+1, 3, c.PRNG)
+        tabh,tabf,tabg = h*(2*grids[0] - 1), p*(2*grids[1] - 1), p*(2*grids[2] - 1)
+    else:
+        prng = get_prng(key, c.PRNG) #bulk
+        tabh,tabf,tabg = RandArray(h,n+1,prng),RandArray(p,n+1,prng),RandArray(p,n+1,prng)
+    _set_seeded_condition(c.SEED, l,t,tabh,n,h,1,c.WORLD_SIDE_CHUNKS,memo,c.PRNG,
+                          c.lattice_memo)
+    return [tab.astype(c.DTYPE, copy=False) for tab in (tabh, tabf, tabg)]
+
+#About dtypes: all the computations are done with c.DTYPE (lattices, cached
+#spaces and accumulation), and the generate functions convert the result to
+#their <dtype> argument if given (see _finish). With c.DTYPE = "float32", the
+#cached spaces are built in float32 too, which halves their memory, and the
+#absolute error with respect to float64 is below 2e-6 * c.max_h (measured
+#max: 1.0e-6 * c.max_h for NoiseCache and Perlin, 3e-7 for ZeroGradient,
+#with S=512, DEPTH=7).
+#Unsigned integer dtypes give quantized heights (see quantize), whose error
+#is at most half a step, i.e. c.max_h / 65535 for uint16. Signed integer
+#dtypes are refused, as truncating heights of magnitude about 1 is useless.
+
+def quantize(hmap:np.ndarray, c:Cache, dtype="uint16")->np.ndarray:
+    """Maps heights from [-c.max_h, c.max_h] (see theoretical_normalize) to the
+    whole range of the unsigned int <dtype>, rounding to nearest. Values out
+    of this range (possible with NoiseCache and Perlin) are clipped."""
+    with stage("normalization"):
+        top = np.iinfo(dtype).max
+        q = c.theoretical_normalize(hmap) * top + 0.5
+        return np.clip(q, 0, top).astype(dtype)
 
-def generate_terrain(chunk:tuple[int,int], c:NoiseCache)->np.ndarray:
+def _finish(hmap, c, dtype):
+    if dtype is None:
+        return hmap
+    elif np.dtype(dtype).kind == "u":
+        return quantize(hmap, c, dtype)
+    elif np.dtype(dtype).kind == "i":
+        raise ValueError("Signed integer dtypes are not supported, use an "
+                         "unsigned one (quantized heights) or a float one: "
+                         + np.dtype(dtype).name)
+    return hmap.astype(dtype, copy=False)
+
+def generate_terrain(chunk:tuple[int,int], c:NoiseCache, dtype=None, lod:int=1,
+                     exact:bool=False, backend:str="numpy")->np.ndarray:
     """Returns an array of heigth values using <chunk> as seed and <p> as parameters.
+    With <lod> > 1 (level of detail, a divisor of c.S), a (S/lod,S/lod) array
+    is returned, whose pixel [i,j] is the pixel [i*lod,j*lod] of the full
+    resolution chunk, except that the octaves whose cells are smaller than
+    <lod> pixels are skipped (they would alias). If <exact> is True, they
+    are kept instead, and the result is exactly the full resolution chunk
+    sampled every <lod> pixels, for little more cost.
+    With <backend> "c", the compiled kernel of ckernel.py is used if it is
+    available and supports <c> and <lod> (otherwise numpy is used).
     """
-    hmap = np.zeros((c.S,c.S))
-    for k in c.LEVELS:
-        h,f,g = get_seeded_conditions(chunk, k, c)
-        for x in range(c.PARAM_N[k]):
-            for y in range(c.PARAM_N[k]):
-                pol = c.polynom(h[x:x+2,y:y+2], f[x:x+2,y:y+2], g[x:x+2,y:y+2])
-                pol.fill_array(hmap, c, k, x, y)
-    return hmap
-
-def generate_terrain_d2m1n3(chunk:tuple[int,int], c:NoiseCache)->np.ndarray:
+    if c.S % lod:
+        raise ValueError("lod must divide S=%d, got %d" % (c.S, lod))
+    if backend == "c":
+        from . import ckernel
+        if lod == 1 and ckernel.supports(c):
+            with stage("generate_terrain", chunk=chunk, backend="c"):
+                return _finish(ckernel.generate_terrain(chunk, c), c, dtype)
+    elif backend != "numpy":
+        raise ValueError("Unknown backend: " + str(backend))
+    with stage("generate_terrain", chunk=chunk):
+        hmap = np.zeros((c.S//lod,c.S//lod), dtype=c.DTYPE)
+        for k in c.LEVELS:
+            if c.RES[k] < lod and not exact:
+                continue
+            with stage("seeding", k=k):
+                h,f,g = get_seeded_conditions(chunk, k, c)
+            _fill_lod_octave(hmap, c, k, h, f, g, lod)
+        return _finish(hmap, c, dtype)
+
+def _fill_lod_octave(a, c, k, h, f, g, lod):
+    res = c.RES[k]
+    if res % lod == 0: #every cell contains res/lod pixels of a
+        c.polynom.fill_octave(a, c, k, h, f, g, lod)
+    elif lod % res == 0: #pixels of a are the top-left corners of 1 cell every lod/res
+        q = lod // res
+        with stage("coefficients", k=k):
+            cf = [coeff[...,::q,::q] for coeff in c.polynom.cell_coeffs(h, f, g)]
+        with stage("evaluation", k=k):
+            block = c.polynom.eval_coeffs(cf, c, k, lambda name:c.get_basis(k, name)[:1,:1])
+        with stage("accumulation", k=k):
+            a += block
+    else:
+        raise ValueError("lod=%d does not fit the cells of %d pixels of level %d"
+                         % (lod, res, k))
+
+def generate_terrain_d2m1n3(chunk:tuple[int,int], c:NoiseCache, dtype=None)->np.ndarray:
     """Returns an array of heigth values using <chunk> as seed and <p> as parameters.
     Very slightly faster than generate_terrain when called many times a frame.
     """
-    hmap = np.zeros((c.S,c.S))
-    for k in c.LEVELS:
-        h = get_seeded_conditions_d2m1n3(chunk, k, c)
-        for x in range(c.PARAM_N[k]):
-            for y in range(c.PARAM_N[k]):
-                pol = c.polynom(h[x:x+2,y:y+2], None, None)
-                pol.fill_array(hmap, c, k, x, y)
-    return hmap
-
-def generate_rect_terrain(chunk:tuple[int,int], c:NoiseCache, width:int, height:int)->np.ndarray:
-    hmap = np.zeros((int(c.S*width),int(c.S*height)))
+    with stage("generate_terrain_d2m1n3", chunk=chunk):
+        hmap = np.zeros((c.S,c.S), dtype=c.DTYPE)
+        for k in c.LEVELS:
+            with stage("seeding", k=k):
+                h = get_seeded_conditions_d2m1n3(chunk, k, c)
+            c.polynom.fill_octave(hmap, c, k, h, None, None)
+        return _finish(hmap, c, dtype)
+
+def generate_rect_terrain(chunk:tuple[int,int], c:NoiseCache, width:int, height:int,
+                          dtype=None)->np.ndarray:
+    """Returns the (S*width,S*height) top-left part of <chunk>, <width> and
+    <height> being fractions of the chunk in ]0,1]. The octaves having less
+    than one cell in this part are skipped."""
+    if not (0 < width <= 1 and 0 < height <= 1):
+        raise ValueError("width and height must be in ]0,1], got %s, %s" % (width, height))
+    with stage("generate_rect_terrain", chunk=chunk):
+        hmap = np.zeros((int(c.S*width),int(c.S*height)), dtype=c.DTYPE)
+        for k in c.LEVELS:
+            with stage("seeding", k=k):
+                h,f,g = get_seeded_conditions(chunk, k, c)
+            sizew = int(c.PARAM_N[k] * width)
+            sizeh = int(c.PARAM_N[k] * height)
+            if sizew > 0 and sizeh > 0:
+                w, hh = sizew+1, sizeh+1
+                c.polynom.fill_octave(hmap, c, k, h[:w,:hh], f[:w,:hh], g[:w,:hh])
+        return _finish(hmap, c, dtype)
+
+
+class PartialTerrain:
+    """Heightmap of a chunk built octave by octave, e.g. to show a coarse
+    preview first and add details later. Since octaves are added to the
+    heightmap one after the other, the complete result is exactly that of
+    generate_terrain, for the same total cost.
+
+    usage :
+        terrain = PartialTerrain((3,4), c)
+        preview = terrain.refine(2) #2 coarsest octaves only
+        ...
+        hmap = terrain.refine() #adds the other ones
+    """
+
+    def __init__(self, chunk:tuple[int,int], c:NoiseCache):
+        self.chunk = chunk
+        self.c = c
+        self.hmap = np.zeros((c.S,c.S), dtype=c.DTYPE)
+        self.depth = 0 #number of octaves already added to hmap
+
+    def refine(self, depth:int|None=None)->np.ndarray:
+        """Adds the missing octaves up to <depth> (default: all of them) and
+        returns the heightmap, which is updated in place by later calls."""
+        depth = self.c.DEPTH if depth is None else min(depth, self.c.DEPTH)
+        with stage("refine", chunk=self.chunk):
+            for k in range(self.depth, depth):
+                with stage("seeding", k=k):
+                    h,f,g = get_seeded_conditions(self.chunk, k, self.c)
+                self.c.polynom.fill_octave(self.hmap, self.c, k, h, f, g)
+                self.depth = k + 1
+        return self.hmap
+
+    def is_complete(self)->bool:
+        return self.depth == self.c.DEPTH
+
+    def get_missing_h(self)->float:
+        """Returns the sum of the amplitudes (PARAM_H) of the missing octaves,
+        i.e. roughly how far the heightmap may still move."""
+        return sum(self.c.PARAM_H[self.depth:])
+
+
+def generate_window(x0:int, y0:int, width:int, height:int, c:NoiseCache,
+                    dtype=None, memo:dict|None=None, coeffs:dict|None=None)->np.ndarray:
+    """Returns the (width,height) array of height values of the pixels
+    x0 <= x < x0+width, y0 <= y < y0+height in world pixel coordinates (chunk
+    (l,t) covers pixels l*S <= x < (l+1)*S and t*S <= y < (t+1)*S).
+    The result is identical to the same window cropped from the mosaic of
+    generate_terrain chunks, but only the requested pixels are evaluated.
+    <memo> is an optional dict of edge values shared between calls (see
+    get_seeded_conditions). <coeffs> is an optional dict keeping the cell
+    coefficients of the touched chunks for later calls, so that windows
+    covering the same chunks (e.g. successive strips, see stream.py) seed
+    them only once.
+    """
+    with stage("generate_window", x0=x0, y0=y0, width=width, height=height):
+        hmap = np.zeros((max(width,0),max(height,0)), dtype=c.DTYPE)
+        if width <= 0 or height <= 0:
+            return _finish(hmap, c, dtype)
+        cx, px = np.divmod(x0 + np.arange(width), c.S) #chunk and position in chunk
+        cy, py = np.divmod(y0 + np.arange(height), c.S)
+        chunks = [(l,t) for l in range(cx[0], cx[-1]+1) for t in range(cy[0], cy[-1]+1)]
+        ncx, ncy = cx[-1]-cx[0]+1, cy[-1]-cy[0]+1
+        cx, cy = cx - cx[0], cy - cy[0]
+        for k in c.LEVELS:
+            n, res = c.PARAM_N[k], c.RES[k]
+            if memo is None:
+                memo = {}
+            cf = _get_chunk_coeffs(chunks, k, c, memo, coeffs)
+            with stage("coefficients", k=k):
+                #coefficients of all the cells of the touched chunks, as (ncx*n,ncy*n) arrays
+                cf = [coeff.reshape((ncx,ncy,n,n)).transpose(0,2,1,3).reshape((ncx*n,ncy*n))
+                      for coeff in cf]
+                cells = np.ix_(cx*n + px//res, cy*n + py//res) #cell of each pixel
+                space = np.ix_(px%res, py%res) #position of each pixel in its cell
+                cf = [coeff[cells] for coeff in cf]
+            with stage("evaluation", k=k):
+                basis = lambda name:np.broadcast_to(c.get_basis(k, name), (res,res))[space]
+                block = c.polynom.eval_coeffs(cf, c, k, basis)
+            with stage("accumulation", k=k):
+                hmap += block
+        return _finish(hmap, c, dtype)
+
+def _get_chunk_coeffs(chunks, k, c, memo, coeffs=None):
+    """Returns the cell coefficients of level k of <chunks>, as (N,n,n)
+    arrays (see cell_coeffs). Those found in the dict <coeffs> (by (chunk,k))
+    are reused, and the others are added to it."""
+    #known ones are read before adding the others, which may evict them
+    known = {} if coeffs is None else {chunk:coeffs[(chunk,k)] for chunk in chunks
+                                       if (chunk,k) in coeffs}
+    missing = [chunk for chunk in chunks if chunk not in known]
+    if missing:
+        with stage("seeding", k=k):
+            conditions = [get_seeded_conditions(chunk, k, c, memo) for chunk in missing]
+            h,f,g = [np.array(tabs) for tabs in zip(*conditions)]
+        with stage("coefficients", k=k):
+            cf = c.polynom.cell_coeffs(h, f, g)
+        if coeffs is None:
+            return cf
+        for i, chunk in enumerate(missing):
+            known[chunk] = coeffs[(chunk,k)] = [coeff[i] for coeff in cf]
+    return [np.array(coeff) for coeff in zip(*[known[chunk] for chunk in chunks])]
+
+def _unique_chunks(cx, cy):
+    """Returns the distinct chunks among (cx,cy) as a list of tuples, and the
+    index of the chunk of each point in this list."""
+    x0, y0 = cx.min(), cy.min()
+    keys = (cx - x0)*(cy.max() - y0 + 1) + (cy - y0)
+    keys, inverse = np.unique(keys, return_inverse=True)
+    lx, ly = np.divmod(keys, cy.max() - y0 + 1)
+    return [(int(l), int(t)) for l,t in zip(lx + x0, ly + y0)], inverse.reshape(-1)
+
+def _point_conditions(cx, cy, ix, iy, k, c, chunks, inverse):
+    """Returns the (N,2,2) lattice values h,f,g around the cells (ix,iy) of
+    chunks (cx,cy) (int arrays of length N) for level k. <chunks> and
+    <inverse> are given by _unique_chunks."""
+    n = c.PARAM_N[k]
+    if c.LATTICE == "hash":
+        d = np.arange(2)
+        x = (cx*n + ix)[:,None,None] + d[None,:,None]
+        y = (cy*n + iy)[:,None,None] + d[None,None,:]
+        tabs = [hash_lattice(c, k, x, y, flag) if flag in c.polynom.lattices else None
+                for flag in range(3)]
+        if tabs[0] is not None:
+            tabs[0] *= c.PARAM_H[k]
+        return tabs
+    memo = {}
+    conditions = [get_seeded_conditions(chunk, k, c, memo) for chunk in chunks]
+    #flat index in the stacked lattices of the topleft corner of each cell
+    i = (inverse*(n+1) + ix)*(n+1) + iy
+    corners = np.array([[0, 1], [n+1, n+2]]) #offsets of the 4 corners
+    i = i[:,None,None] + corners[None,:,:]
+    return [np.array(tabs).take(i) for tabs in zip(*conditions)]
+
+def sample_points(xs, ys, c:NoiseCache, dtype=None)->np.ndarray:
+    """Returns the height values at world pixel coordinates <xs>, <ys> (int or
+    float arrays of the same shape, see generate_window for the coordinate
+    system). At integer positions, the values are exactly those of the chunks
+    returned by generate_terrain ; between pixels, the same polynoms are
+    evaluated at sub-pixel positions.
+    """
+    with stage("sample_points"):
+        xs, ys = np.broadcast_arrays(np.asarray(xs), np.asarray(ys))
+        shape = xs.shape
+        xs, ys = xs.reshape(-1), ys.reshape(-1)
+        cx, cy = np.floor_divide(xs, c.S), np.floor_divide(ys, c.S) #chunks
+        px, py = xs - cx*c.S, ys - cy*c.S #positions in chunks
+        cx, cy = cx.astype(np.int64), cy.astype(np.int64)
+        result = np.zeros(xs.shape, dtype=c.DTYPE)
+        if not xs.size:
+            return _finish(result.reshape(shape), c, dtype)
+        if c.LATTICE != "hash":
+            chunks, inverse = _unique_chunks(cx, cy)
+        else:
+            chunks, inverse = None, None
+        for k in c.LEVELS:
+            res = c.RES[k]
+            ix, iy = np.floor_divide(px, res), np.floor_divide(py, res) #cells
+            u, v = (px - ix*res)*(1./res), (py - iy*res)*(1./res) #positions in cells
+            u, v = u.astype(c.DTYPE, copy=False), v.astype(c.DTYPE, copy=False)
+            ix, iy = ix.astype(np.int64), iy.astype(np.int64)
+            with stage("seeding", k=k):
+                h,f,g = _point_conditions(cx, cy, ix, iy, k, c, chunks, inverse)
+            with stage("coefficients", k=k):
+                cf = [coeff[:,0,0] for coeff in c.polynom.cell_coeffs(h, f, g)]
+            with stage("evaluation", k=k):
+                block = c.polynom.eval_coeffs(cf, c, k, lambda name:c.get_basis_at(u, v, name))
+            with stage("accumulation", k=k):
+                result += block
+        return _finish(result.reshape(shape), c, dtype)
+
+#Max number of pixels evaluated at once by generate_chunks. Bigger batches do
+#not go faster, as temporaries stop fitting in the CPU cache.
+BATCH_PIXELS = 2**18
+
+def generate_chunks(chunks, c:NoiseCache, out:np.ndarray|None=None,
+                    dtype=None, memo:dict|None=None)->np.ndarray:
+    """Returns a (N,S,S) array whose i-th item is generate_terrain(chunks[i], c).
+    <chunks> is a sequence (or (N,2) array) of chunk coordinates. If <out> is
+    given, results are written into it (it is zeroed first) and it is returned,
+    with its own dtype. <memo> is an optional dict of edge values shared with
+    other calls (see stream.py).
+
+    Same result as calling generate_terrain N times, with less per-call
+    overhead: seeded edges shared by neighbouring chunks are drawn only once,
+    and the polynoms of each octave are evaluated for the whole batch at once.
+    This mainly pays off for small chunks (at S=512 both take about as long).
+    """
+    with stage("generate_chunks", chunks=len(chunks)):
+        chunks = [(int(l), int(t)) for l,t in chunks]
+        if out is None:
+            out = np.zeros((len(chunks),c.S,c.S), dtype=c.DTYPE if dtype is None else dtype)
+        direct = out.dtype == np.dtype(c.DTYPE) #else, results are converted
+        step = max(1, BATCH_PIXELS // (c.S*c.S)) #chunks evaluated together
+        if memo is None:
+            memo = {} #edge values shared between the chunks of the batch
+        for i in range(0, len(chunks), step):
+            batch = chunks[i:i+step]
+            if direct:
+                hmaps = out[i:i+step]
+                hmaps[...] = 0.
+            else:
+                hmaps = np.zeros((len(batch),c.S,c.S), dtype=c.DTYPE)
+            for k in c.LEVELS:
+                with stage("seeding", k=k, chunks=len(batch)):
+                    conditions = [get_seeded_conditions(chunk, k, c, memo) for chunk in batch]
+                    h,f,g = [np.array(tabs) for tabs in zip(*conditions)]
+                c.polynom.fill_octave(hmaps, c, k, h, f, g)
+            if not direct:
+                out[i:i+step] = _finish(hmaps, c, out.dtype)
+        return out
+
+def generate_world(c:NoiseCache, dtype=None)->np.ndarray:
+    """Returns the (W*S,H*S) mosaic of the W times H chunks of the world
+    (W,H = c.WORLD_SIDE_CHUNKS), e.g. to bake a tileable texture. With
+    c.LATTICE "world" or "hash", the mosaic tiles seamlessly (see
+    get_seam_error)."""
+    W, H = c.WORLD_SIDE_CHUNKS
+    with stage("generate_world", chunks=W*H):
+        chunks = [(l,t) for l in range(W) for t in range(H)]
+        hmaps = generate_chunks(chunks, c, dtype=dtype)
+        return hmaps.reshape((W,H,c.S,c.S)).transpose(0,2,1,3).reshape((W*c.S,H*c.S))
+
+def get_seam_error(c:NoiseCache)->float:
+    """Returns the largest difference between the lattice values that two
+    neighbouring chunks of the world (W,H = c.WORLD_SIDE_CHUNKS) give to their
+    common edge, the chunks of the last column (row) being the left (top)
+    neighbours of those of the first one. The world tiles seamlessly if it is
+    0. Only the lattices used by c.polynom are compared."""
+    W, H = c.WORLD_SIDE_CHUNKS
+    error = 0.
     for k in c.LEVELS:
-        h,f,g = get_seeded_conditions(chunk, k, c)
-        sizew = int(c.PARAM_N[k] * width)
-        sizeh = int(c.PARAM_N[k] * height)
-        for x in range(sizew):
-            for y in range(sizeh):
-                pol = c.polynom(h[x:x+2,y:y+2], f[x:x+2,y:y+2], g[x:x+2,y:y+2])
-                pol.fill_array(hmap, c, k, x, y)
-    return hmap
+        n = c.PARAM_N[k]
+        tabs = {(l,t):get_seeded_conditions((l,t), k, c) for l in range(W) for t in range(H)}
+        for (l,t), tab in tabs.items():
+            right, bottom = tabs[((l+1)%W,t)], tabs[(l,(t+1)%H)]
+            for flag in c.polynom.lattices:
+                error = max(error, np.abs(tab[flag][n,:] - right[flag][0,:]).max(),
+                            np.abs(tab[flag][:,n] - bottom[flag][:,0]).max())
+    return float(error)
 
 
 def normalize(hmap:np.ndarray)->np.ndarray:
-    minh, maxh = np.min(hmap), np.max(hmap)
-    return (hmap-minh)/(maxh-minh)
+    with stage("normalization"):
+        minh, maxh = np.min(hmap), np.max(hmap)
+        return (hmap-minh)/(maxh-minh)
 
 def theoretical_normalize(hmap:np.ndarray, c:Cache)->np.ndarray:
-    return c.theoretical_normalize(hmap)
+    with stage("normalization"):
+        return c.theoretical_normalize(hmap)
 
-def get_x(res):
+def get_x(res, columns=None): #a[x,y] = x/res, for y < columns (default: res)
     domain = np.arange(0., 1., 1./res)
-    a = np.zeros((res,res))
-    for x in range(res):
-        a[x,:] = domain[x]
-    return a
+    return np.repeat(domain[:,None], res if columns is None else columns, axis=1)
 
 def s1(x):
     return x
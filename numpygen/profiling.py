@@ -0,0 +1,139 @@
+"""This module provides an opt-in instrumentation of the numpy terrain
+pipeline. The generators wrap each of their stages (seeding, coefficients,
+evaluation, accumulation, normalization, colorization) in stage(...), which
+does nothing unless a profile is active.
+
+usage :
+    with profile(track_memory=True) as prof:
+        hmap = noisegen.generate_terrain((0,0), c)
+    print(prof.to_dict()["stages"])
+    prof.save_chrome_trace("trace.json") #open with chrome://tracing or Perfetto
+
+Stages of level k carry k in their arguments, and the generate functions add
+the chunk coordinates, so that times can be split by octave and by chunk.
+"""
+import contextlib
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+_profiler = None #active Profiler, if any
+_NULL = contextlib.nullcontext()
+
+
+class _Stage:
+
+    def __init__(self, profiler, name, args):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        stack = self.profiler._get_stack()
+        if stack: #bytes of the parent are meaningless if it has children
+            stack[-1].has_children = True
+        stack.append(self)
+        self.has_children = False
+        if self.profiler.track_memory:
+            self.mem0 = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        t1 = time.perf_counter()
+        self.profiler._get_stack().pop()
+        event = {"name":self.name, "start":self.t0, "seconds":t1 - self.t0,
+                 "thread":threading.get_ident(), "args":self.args}
+        if self.profiler.track_memory and not self.has_children:
+            event["bytes"] = tracemalloc.get_traced_memory()[1] - self.mem0
+        self.profiler._record(event)
+        return False
+
+
+class Profiler:
+
+    def __init__(self, track_memory:bool=False, callback=None):
+        """If <track_memory> is True, tracemalloc records the peak memory
+        allocated by each innermost stage (this slows down generation).
+        <callback>, if given, is called with each event (a dict) as soon as a
+        stage ends, e.g. to feed production metrics."""
+        self.track_memory = track_memory
+        self.callback = callback
+        self.events = []
+        self.local = threading.local()
+        self.origin = time.perf_counter()
+
+    def _get_stack(self):
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def _record(self, event):
+        self.events.append(event)
+        if self.callback:
+            self.callback(event)
+
+    def stage(self, name, **args):
+        return _Stage(self, name, args)
+
+    def to_dict(self)->dict:
+        """Returns the events, along with totals (calls, seconds, bytes) by
+        stage and by (stage, level). Bytes are None for stages that contain
+        other stages, or when memory is not tracked."""
+        stages, octaves = {}, {}
+        for e in self.events:
+            keys = [(stages, e["name"])]
+            if "k" in e["args"]:
+                keys.append((octaves, (e["name"], e["args"]["k"])))
+            for d, key in keys:
+                total = d.setdefault(key, {"calls":0, "seconds":0., "bytes":None})
+                total["calls"] += 1
+                total["seconds"] += e["seconds"]
+                if "bytes" in e: #innermost stages only
+                    total["bytes"] = (total["bytes"] or 0) + e["bytes"]
+        octaves = {"%s[k=%d]" % key:total for key, total in sorted(octaves.items())}
+        return {"events":self.events, "stages":stages, "octaves":octaves}
+
+    def to_chrome_trace(self)->dict:
+        """Returns the events in the Chrome trace event format."""
+        trace = []
+        for e in self.events:
+            args = {key:str(value) for key, value in e["args"].items()}
+            if "bytes" in e:
+                args["bytes"] = e["bytes"]
+            trace.append({"name":e["name"], "ph":"X", "pid":os.getpid(),
+                          "tid":e["thread"], "args":args,
+                          "ts":(e["start"] - self.origin)*1e6, "dur":e["seconds"]*1e6})
+        return {"traceEvents":trace, "displayTimeUnit":"ms"}
+
+    def save_chrome_trace(self, filename:str):
+        with open(filename, "w") as f:
+            json.dump(self.to_chrome_trace(), f)
+
+
+def stage(name, **args):
+    """Context manager timing the stage <name> if a profile is active."""
+    if _profiler is None:
+        return _NULL
+    return _profiler.stage(name, **args)
+
+@contextlib.contextmanager
+def profile(track_memory:bool=False, callback=None):
+    """Activates a Profiler (see its constructor) for the duration of the
+    block, and yields it."""
+    global _profiler
+    previous = _profiler
+    _profiler = Profiler(track_memory, callback)
+    started = track_memory and not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        yield _profiler
+    finally:
+        if started:
+            tracemalloc.stop()
+        _profiler = previous
@@ -0,0 +1,81 @@
+"""This module provides a disk store of generated chunks, so that a world
+explored before is not generated again after a restart.
+
+Each chunk is saved as a .npy file in a folder named after the noise type and
+a hash of its parameters (see noisegen.Cache.get_params). Changing any
+parameter (DEPTH, H_DIVIDER, DOM_DIVIDER, MIN_N, S, SEED...) thus selects
+another folder, and chunks of the old world are never served. Chunks are read
+back as read-only np.memmap, so that a read costs little more than page faults.
+
+usage :
+    store = ChunkStore("worlds", c)
+    hmap = store.get((3,4)) #generated and saved the first time
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+
+from . import noisegen as ng
+
+
+def get_params_hash(c:ng.Cache)->str:
+    """Returns a short hash identifying the noise type and parameters of <c>."""
+    key = repr((c.__class__.__name__, sorted(c.get_params().items())))
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+class ChunkStore:
+
+    def __init__(self, root:str, c:ng.Cache, generator=ng.generate_terrain):
+        """Chunks generated with <c> are stored in a subfolder of <root>.
+        <generator> is called as generator(chunk, c) for missing chunks."""
+        self.root = root
+        self.c = c
+        self.generator = generator
+        self.folder = os.path.join(root, c.__class__.__name__ + "_" + get_params_hash(c))
+        os.makedirs(self.folder, exist_ok=True)
+        params_file = os.path.join(self.folder, "params.json")
+        if not os.path.exists(params_file): #for humans only
+            with open(params_file, "w") as f:
+                json.dump(c.get_params(), f, indent=1)
+
+    def get_path(self, chunk:tuple[int,int])->str:
+        return os.path.join(self.folder, "%d_%d.npy" % tuple(chunk))
+
+    def __contains__(self, chunk):
+        return os.path.exists(self.get_path(chunk))
+
+    def save(self, chunk:tuple[int,int], hmap:np.ndarray):
+        """Writes <hmap> as the heightmap of <chunk>. The file is written under
+        a temporary name and then renamed, so that readers never see a partial
+        chunk."""
+        fd, tmp = tempfile.mkstemp(suffix=".npy", dir=self.folder)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, hmap)
+            os.replace(tmp, self.get_path(chunk))
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    def load(self, chunk:tuple[int,int])->np.memmap:
+        """Returns a read-only memory-mapped view of a stored chunk."""
+        return np.load(self.get_path(chunk), mmap_mode="r")
+
+    def get(self, chunk:tuple[int,int])->np.ndarray:
+        """Returns the heightmap of <chunk>, generating and saving it if it is
+        not stored yet."""
+        if chunk not in self:
+            self.save(chunk, self.generator(chunk, self.c))
+        return self.load(chunk)
+
+    def purge_others(self):
+        """Deletes the folders of <root> holding chunks generated with other
+        parameters or noise types."""
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if path != self.folder and os.path.exists(os.path.join(path, "params.json")):
+                shutil.rmtree(path)
@@ -0,0 +1,160 @@
+"""This module provides generators walking over large regions of the world
+with bounded memory, for offline jobs on worlds too big to hold in memory.
+
+iter_tiles yields the chunks of a region one by one, in raster or Hilbert
+order, and iter_strips yields horizontal strips of any height. Both reuse the
+seeded edges shared with the previous tiles (see EdgeMemo), and only keep a
+bounded number of tiles alive. Sinks consume them lazily.
+
+usage :
+    tiles = iter_tiles(c, (0,0), 1000, 1000, order="hilbert")
+    save_tiles(tiles, store.ChunkStore("worlds", c)) #one chunk at a time
+    #or
+    for chunk, rgb in colorize(iter_tiles(c, (0,0), 10, 10), c, colorscale.SUMMER):
+        ...
+
+The yielded arrays are only referenced by the caller, so memory stays bounded
+as long as they are not all kept.
+"""
+from collections import OrderedDict
+import numpy as np
+
+from . import noisegen as ng
+
+
+class EdgeMemo(OrderedDict):
+    """Dict of seeded edges (see noisegen._seeded_random) forgetting the
+    least recently used entries beyond <max_entries>."""
+
+    def __init__(self, max_entries:int):
+        OrderedDict.__init__(self)
+        self.max_entries = max_entries
+
+    def __getitem__(self, key):
+        self.move_to_end(key)
+        return OrderedDict.__getitem__(self, key)
+
+    def __setitem__(self, key, value):
+        OrderedDict.__setitem__(self, key, value)
+        if len(self) > self.max_entries:
+            self.popitem(last=False)
+
+
+def _get_edge_memo(c, side, max_tiles):
+    #a chunk has at most 8 edges and corners per level, and the edges of the
+    #previous row (or Hilbert block) must survive until they are reused
+    return EdgeMemo(8*len(c.LEVELS)*(side + max_tiles + 2))
+
+def _hilbert_d2xy(order, d): #position of the d-th cell of a 2**order square
+    x = y = 0
+    s = 1
+    while s < 2**order:
+        rx = 1 & (d//2)
+        ry = 1 & (d ^ rx)
+        if ry == 0: #rotate
+            if rx == 1:
+                x, y = s-1-x, s-1-y
+            x, y = y, x
+        x += s*rx
+        y += s*ry
+        d //= 4
+        s *= 2
+    return x, y
+
+def iter_chunks(chunk0:tuple[int,int], width:int, height:int, order="raster"):
+    """Yields the chunks (l,t) of the region of <width> times <height> chunks
+    starting at <chunk0>. With order="raster", rows (same t) are walked one
+    after the other ; with order="hilbert", the region is walked along a
+    Hilbert curve, so that consecutive chunks are mostly neighbours (always
+    for a square region whose side is a power of two ; otherwise the curve
+    jumps over the chunks out of the region)."""
+    l0, t0 = chunk0
+    if order == "raster":
+        for j in range(height):
+            for i in range(width):
+                yield (l0+i, t0+j)
+    elif order == "hilbert":
+        n = max(width, height, 1)
+        order = (n-1).bit_length()
+        for d in range(4**order):
+            i, j = _hilbert_d2xy(order, d)
+            if i < width and j < height:
+                yield (l0+i, t0+j)
+    else:
+        raise ValueError("Unknown order: " + str(order))
+
+def iter_tiles(c:ng.Cache, chunk0:tuple[int,int], width:int, height:int,
+               order="raster", max_tiles:int=16, dtype=None):
+    """Yields (chunk, heightmap) for the chunks of the region of <width> times
+    <height> chunks starting at <chunk0>, in <order> (see iter_chunks). Tiles
+    are generated by groups of <max_tiles> with noisegen.generate_chunks, so
+    that at most <max_tiles> new heightmaps exist at any time (plus those kept
+    by the caller)."""
+    memo = _get_edge_memo(c, max(width, height), max_tiles)
+    group = []
+    for chunk in iter_chunks(chunk0, width, height, order):
+        group.append(chunk)
+        if len(group) == max_tiles:
+            yield from _generate_group(group, c, dtype, memo)
+            group = []
+    if group:
+        yield from _generate_group(group, c, dtype, memo)
+
+def _generate_group(group, c, dtype, memo):
+    hmaps = ng.generate_chunks(group, c, dtype=dtype, memo=memo)
+    for i, chunk in enumerate(group):
+        yield chunk, hmaps[i]
+
+def iter_strips(c:ng.Cache, chunk0:tuple[int,int], width:int, height:int,
+                strip_height:int, max_tiles:int=16, dtype=None):
+    """Yields (y, strip) where strip is the (width*S, strip_height) array of
+    the pixel rows y <= ... < y+strip_height (world pixel coordinates, see
+    noisegen.generate_window) of the region of <width> times <height> chunks
+    starting at <chunk0>. The last strip may be thinner. Each strip is
+    evaluated by pieces of at most <max_tiles> chunks worth of pixels.
+    The cell coefficients of the chunk rows under the current strip are kept
+    until the strips leave them, so that each chunk is seeded only once
+    (for the default parameters, they take about a quarter of the memory of
+    the heightmap of a chunk)."""
+    S = c.S
+    x0, y0 = chunk0[0]*S, chunk0[1]*S
+    piece = max(1, max_tiles*S*S // strip_height) #width of the pieces
+    memo = _get_edge_memo(c, width, max_tiles)
+    #a strip covers at most ceil(strip_height/S)+1 chunk rows (unaligned
+    #strips) of width+1 chunks (unaligned pieces)
+    rows = -(-strip_height//S) + 1
+    coeffs = EdgeMemo(rows*(width + 2)*len(c.LEVELS))
+    for y in range(y0, y0 + height*S, strip_height):
+        h = min(strip_height, y0 + height*S - y)
+        strip = np.empty((width*S, h), dtype=c.DTYPE if dtype is None else dtype)
+        for x in range(0, width*S, piece):
+            w = min(piece, width*S - x)
+            strip[x:x+w] = ng.generate_window(x0+x, y, w, h, c, dtype, memo, coeffs)
+        yield y, strip
+
+
+def colorize(tiles, c:ng.Cache, colormap):
+    """Yields (key, colors) for each (key, heightmap) of <tiles>, heights being
+    mapped to [0,1] with c.theoretical_normalize, so that tiles match at their
+    borders."""
+    for key, hmap in tiles:
+        yield key, colormap.get(c.theoretical_normalize(hmap))
+
+def save_tiles(tiles, store)->int:
+    """Saves each (chunk, heightmap) of <tiles> in <store> (see
+    store.ChunkStore). Returns the number of tiles saved."""
+    count = 0
+    for chunk, hmap in tiles:
+        store.save(chunk, hmap)
+        count += 1
+    return count
+
+def write_strips(strips, filename:str, y0:int, shape:tuple[int,int], dtype="float64"):
+    """Writes each (y, strip) of <strips> into the .npy file <filename>, holding
+    a <shape> array whose first pixel row is <y0>, without loading the whole
+    file in memory."""
+    out = np.lib.format.open_memmap(filename, mode="w+", dtype=dtype, shape=shape)
+    for y, strip in strips:
+        out[:strip.shape[0], y-y0:y-y0+strip.shape[1]] = strip
+    out.flush()
+    del out
@@ -0,0 +1,83 @@
+"""This module provides a pure python version of the ZeroGradient noise of
+numpygen with LATTICE = "hash" (see numpygen.noisegen.hash_lattice), with no
+dependency. For the same parameters, it gives the same heights as numpygen
+(exactly for power of two sizes), so that both can serve the same world.
+
+It is slow : use it when numpy is not available.
+"""
+from __future__ import print_function, division
+
+_MASK64 = 2**64 - 1
+
+def _splitmix64(x):
+    x = (x + 0x9E3779B97F4A7C15) & _MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+def hash_lattice(seed:int, k:int, x:int, y:int, flag:int, n:int,
+                 world_side_chunks:tuple[int,int]|None)->float:
+    """Value in [-1,1[ of the lattice of level <k> (with <n> cells per chunk)
+    at global lattice coordinates <x>, <y>. The lattice wraps around after
+    <world_side_chunks> chunks, unless it is None."""
+    if world_side_chunks is not None:
+        x %= world_side_chunks[0]*n
+        y %= world_side_chunks[1]*n
+    z = _splitmix64((_splitmix64(seed & _MASK64) ^ k) * 3 + flag)
+    z = _splitmix64(x ^ z)
+    z = _splitmix64(y ^ z)
+    return (z >> 11) * (2./2**53) - 1.
+
+#same smoothsteps as numpygen
+def s1(x):
+    return x
+
+def s3(x):
+    return 3.*x**2 - 2.*x**3
+
+def s5(x):
+    return 6.*x**5 - 15.*x**4 + 10.*x**3
+
+def s7(x):
+    return -20.*x**7 + 70.*x**6 -84.*x**5 + 35.*x**4
+
+def s9(x):
+    return 70*x**9 -315*x**8 + 540*x**7 -420*x**6 + 126*x**5
+
+smoothstep = {1:s1, 3:s3, 5:s5, 7:s7, 9:s9}
+
+def generate_terrain(chunk:tuple[int,int], S:int=512, DEPTH:int=7, H_DIVIDER:float=2.,
+                     DOM_DIVIDER:int=2, MIN_N:int=1, SEED:int=0,
+                     WORLD_SIDE_CHUNKS:tuple[int,int]|None=(1,1), sdegree:int=3)->list[list[float]]:
+    """Returns the <S> times <S> heights of <chunk>, the parameters having the
+    same meaning and defaults as the attributes of numpygen.noisegen.Cache.
+    As there, WORLD_SIDE_CHUNKS = (1,1) is refused (all chunks would be the
+    same) : use None for an unbounded world."""
+    if WORLD_SIDE_CHUNKS is not None and tuple(WORLD_SIDE_CHUNKS) == (1,1):
+        raise ValueError('LATTICE "hash" needs WORLD_SIDE_CHUNKS = None (unbounded '
+                         'world) or the size of the world, not (1,1)')
+    terrain = [[0. for y in range(S)] for x in range(S)]
+    l, t = chunk
+    n = MIN_N
+    s = smoothstep[sdegree]
+    for k in range(DEPTH):
+        amplitude = 1./H_DIVIDER**k
+        res = S//n
+        x = [i*(1./res) for i in range(res)] #as numpygen.noisegen.get_x
+        sx = [s(v) for v in x]
+        h = [[amplitude*hash_lattice(SEED, k, l*n + i, t*n + j, 0, n, WORLD_SIDE_CHUNKS)
+              for j in range(n+1)] for i in range(n+1)]
+        for cx in range(n):
+            for cy in range(n):
+                h0 = h[cx][cy]
+                dhx = h[cx+1][cy] - h0
+                dhy = h[cx][cy+1] - h0
+                A = dhx - h[cx+1][cy+1] + h[cx][cy+1]
+                for i in range(res):
+                    row = terrain[cx*res + i]
+                    xv, sxv = x[i], sx[i]
+                    for j in range(res):
+                        xy = xv*x[j] - x[j]*sxv - xv*sx[j]
+                        row[cy*res + j] += ((dhx*sxv + dhy*sx[j]) + A*xy) + h0
+        n *= DOM_DIVIDER
+    return terrain
@@ -1,8 +1,21 @@
 # (c) Yann Thorimbert 2017
 """This module provides simple functions to generate 2D terrain or noise with
-no dependency, for Python2 and Python3."""
+no dependency, for Python2 and Python3.
+
+If numpy is available, generate_terrain_cache and generate_terrain_local use
+the vectorized versions of vectorized.py, with identical results (set
+USE_NUMPY to False to always run the loops of this module)."""
 from __future__ import print_function, division
-import random, math
+from array import array
+from collections import OrderedDict
+import random, math, warnings
+
+try:
+    from . import vectorized
+except ImportError: #numpy is not available
+    vectorized = None
+
+USE_NUMPY = True
 
 hmap_type = list[list[float]]
 
@@ -13,16 +26,16 @@ except:
     print("Could not import pygame. build_surface function won't work.")
 
 
-#cache variables (not necessarily used)
-caches:dict[tuple[int,int], tuple[list,list,list]] = {}
-
-SMOOTH, DTERM, IDX, S = None, None, None, None
+#cache variables (not necessarily used), from least to most recently used
+caches:OrderedDict[tuple[int,int], tuple[list,list,list]] = OrderedDict()
+MAX_CACHES = 8 #number of (n_octaves, size) tables kept by get_cache
 
 def generate_terrain(size:int,
                      n_octaves:None|int=None,
                      chunk:tuple[int,int]=(0,0),
-                     world_size=None,
-                     persistence:float=2.)->hmap_type:
+                     world_side_chunks=None,
+                     persistence:float=2.,
+                     world_size=None)->hmap_type:
     """
     Returns a <size> times <size> array of heigth values for <n_octaves>, using
     <chunk> as seed.
@@ -30,7 +43,8 @@ def generate_terrain(size:int,
     S = size
     if n_octaves is None:
         n_octaves = int(math.log(S,2))
-    h, min_res = _gen_hmap(n_octaves, S, chunk, world_size)
+    world_side_chunks = _get_world_side_chunks(world_side_chunks, world_size)
+    h, min_res = _gen_hmap(n_octaves, S, chunk, world_side_chunks)
     terrain = [[0. for x in range(S)] for y in range(S)]
     res = int(S)
     step = res//min_res
@@ -81,10 +95,15 @@ def generate_terrain(size:int,
         amplitude /= persistence
     return terrain
 
+def _use_numpy(S):
+    return USE_NUMPY and vectorized is not None and vectorized.is_supported(S)
+
 def generate_terrain_cache(size:int,
                             n_octaves:None|int=None,
                             chunk:tuple[int,int]=(0,0),
-                            persistence:float=2.)->hmap_type:
+                            persistence:float=2.,
+                            world_side_chunks=None,
+                            world_size=None)->hmap_type:
     """
     Returns a <S> times <S> array of heigth values for <n_octaves>, using
     <mapcoord> as seed.
@@ -94,8 +113,12 @@ def generate_terrain_cache(size:int,
     S = size
     if n_octaves is None:
         n_octaves = int(math.log(S,2))
-    SMOOTH, DTERM, IDX = get_cache(n_octaves, S)
-    h, min_res = _gen_hmap(n_octaves, S, chunk)
+    SMOOTH, REL, IDX = get_cache(n_octaves, S)
+    world_side_chunks = _get_world_side_chunks(world_side_chunks, world_size)
+    h, min_res = _gen_hmap(n_octaves, S, chunk, world_side_chunks)
+    if _use_numpy(S):
+        return vectorized.generate_terrain(h, min_res, S, n_octaves, persistence,
+                                           SMOOTH, REL)
     terrain = [[0. for x in range(S)] for y in range(S)]
     res = int(S)
     step = res//min_res
@@ -104,12 +127,13 @@ def generate_terrain_cache(size:int,
     for i in range(n_octaves):
         delta = 1./res #size of current cell
         x_rel = 0. #x-pos in the current cell
+        smooth, rel = SMOOTH[i], REL[i]
         for x in range(S): #here x is coord of pixel
             y_rel = 0. #y-pos in the current cell
-            smoothx = SMOOTH[i][x]
+            smoothx, relx = smooth[x], rel[x]
             for y in range(S):
-                smoothy = SMOOTH[i][y]
-                diag_term = DTERM[i][x][y]
+                smoothy, rely = smooth[y], rel[y]
+                diag_term = relx*rely - smoothx*rely - smoothy*relx
                 if change_cell:
                     idx0, idy0 = int(x/res)*step, int(y/res)*step
                     idx1, idy1 = idx0+step, idy0+step
@@ -138,19 +162,23 @@ def generate_terrain_cache(size:int,
         amplitude /= persistence
     return terrain
 
-def pix(x:int,y:int,n_octaves:int,persistence:float)->float:
-    """Return the height value at one given coord (or pixel).
+def pix(x:int,y:int,n_octaves:int,persistence:float,h:hmap_type,
+        cache:tuple[list,list,list])->float:
+    """Return the height value at one given coord (or pixel), <h> being the
+    random heights of the chunk (see _gen_hmap) and <cache> the tables of
+    get_cache.
     Used for local terrain generation, as in generate_terrain_local."""
-    h = 0.
+    SMOOTH, REL, IDX = cache
+    value = 0.
     amplitude = persistence
-    # res = int(S)
     for i in range(n_octaves):
-        smoothx = SMOOTH[i][x]
-        smoothy = SMOOTH[i][y]
-        diag_term = DTERM[i][x][y]
+        smoothx, relx = SMOOTH[i][x], REL[i][x]
+        smoothy, rely = SMOOTH[i][y], REL[i][y]
+        diag_term = relx*rely - smoothx*rely - smoothy*relx
         #
-        idx0,idx1 = IDX[i][x]
-        idy0,idy1 = IDX[i][y]
+        idx = IDX[i]
+        idx0,idx1 = idx[2*x], idx[2*x+1]
+        idy0,idy1 = idx[2*y], idx[2*y+1]
         h00 = h[idx0][idy0]
         h01 = h[idx0][idy1]
         h10 = h[idx1][idy0]
@@ -160,15 +188,16 @@ def pix(x:int,y:int,n_octaves:int,persistence:float)->float:
         A = dx - h11 + h01
         #
         dh = h00 + smoothx*dx + smoothy*dy + A*diag_term
-        h += amplitude*dh
-        # res //= 2
+        value += amplitude*dh
         amplitude /= persistence
-    return h
+    return value
 
 def generate_terrain_local(size:int,
                             n_octaves:None|int=None,
                             chunk:tuple[int,int]=(0,0),
-                            persistence:float=2.)->hmap_type:
+                            persistence:float=2.,
+                            world_side_chunks=None,
+                            world_size=None)->hmap_type:
     """
     Returns a <S> times <S> array of heigth values for <n_octaves>, using
     <chunk> as seed.
@@ -176,19 +205,21 @@ def generate_terrain_local(size:int,
     Makes use of cached values.
 
     This function is ~2x slower for large terrains, but can be much faster when only a
-    fraction of the terrain needs to be generated.
+    fraction of the terrain needs to be generated (see pix).
     """
-    global S
-    global SMOOTH, DTERM, IDX
     S = size
     if n_octaves is None:
         n_octaves = int(math.log(S,2))
-    SMOOTH, DTERM, IDX = get_cache(n_octaves, S)
-    # h, min_res = _gen_hmap(n_octaves, S, chunk)
+    cache = get_cache(n_octaves, S)
+    world_side_chunks = _get_world_side_chunks(world_side_chunks, world_size)
+    h, min_res = _gen_hmap(n_octaves, S, chunk, world_side_chunks)
+    if _use_numpy(S):
+        return vectorized.generate_terrain(h, min_res, S, n_octaves, persistence,
+                                           cache[0], cache[1])
     terrain = [[0. for x in range(S)] for y in range(S)]
     for x in range(S): #here x is coord of pixel
         for y in range(S):
-            terrain[x][y] = pix(x,y,n_octaves,persistence)
+            terrain[x][y] = pix(x,y,n_octaves,persistence,h,cache)
     return terrain
 
 
@@ -221,24 +252,39 @@ class ColorScale: #tricky structure to obtain fast colormap from heightmap
         return self.default
 
 
-def _gen_hmap(n_octaves, S, chunk, world_size=None):
+def _get_world_side_chunks(world_side_chunks, world_size):
+    """Maps the deprecated <world_size> argument onto <world_side_chunks>."""
+    if world_size is None:
+        return world_side_chunks
+    if world_side_chunks is not None:
+        raise TypeError("Give world_side_chunks only (world_size is deprecated)")
+    warnings.warn("world_size is deprecated, use world_side_chunks",
+                  DeprecationWarning, stacklevel=3)
+    return world_size
+
+def _gen_hmap(n_octaves, S, chunk, world_side_chunks=None):
     """
     Generate random hmap used by terrain generation.
 
-    If world_size is not None, chunk coordinates are wrapped modulo world_size.
-    This makes the world periodic over world_size chunks.
+    If world_side_chunks is not None, chunk coordinates are wrapped modulo
+    world_side_chunks (an int, or a (width, height) tuple like the
+    WORLD_SIDE_CHUNKS of numpygen). This makes the world periodic over
+    world_side_chunks chunks.
 
-    world_size = 1 gives a single seamless chunk.
+    world_side_chunks = 1 gives a single seamless chunk.
     """
     min_res = int(S / 2**(n_octaves - 1))
     hmap_size = S // min_res + 1
 
     XCOORD, YCOORD = chunk
 
+    if isinstance(world_side_chunks, int):
+        world_side_chunks = (world_side_chunks, world_side_chunks)
+
     def wrap_coord(x, y):
-        if world_size is None:
+        if world_side_chunks is None:
             return x, y
-        return x % world_size, y % world_size
+        return x % world_side_chunks[0], y % world_side_chunks[1]
 
     h = [
         [random.random() for y in range(hmap_size)]
@@ -283,42 +329,47 @@ def _gen_hmap(n_octaves, S, chunk, world_size=None):
 
 
 def get_cache(n_octaves:int, S:int)->tuple[list,list,list]:
-    """Build cache that is used by some terrain generation functions."""
-    if (n_octaves, S) in caches:
-        return caches[(n_octaves,S)]
+    """Build cache that is used by some terrain generation functions.
+    Returns the lists (SMOOTH, REL, IDX) of the tables of each octave, where
+    for a pixel coord x:
+        REL[i][x] is the relative position of x in its cell,
+        SMOOTH[i][x] is the smoothstep of REL[i][x],
+        IDX[i][2*x] and IDX[i][2*x+1] are the indices in the random heights of
+        the borders of the cell of x.
+    Tables are compact arrays of S values, and the diagonal term of the
+    polynom at (x,y) is REL[i][x]*REL[i][y] - SMOOTH[i][x]*REL[i][y] -
+    SMOOTH[i][y]*REL[i][x], so that memory is O(n_octaves*S). Only the
+    MAX_CACHES most recently used caches are kept."""
+    key = (n_octaves, S)
+    if key in caches:
+        caches.move_to_end(key)
+        return caches[key]
     #else
     min_res = int(S / 2**(n_octaves-1))
     res = int(S)
     step = res//min_res
-    smoothx_cache, diag_term_cache, idx_cache = [], [], []
-    for i in range(n_octaves):
-        smoothx_cache.append([0. for x in range(S)])
-        diag_term_cache.append([[0. for x in range(S)] for y in range(S)])
-        idx_cache.append([0 for x in range(S)])
+    smoothx_cache, rel_cache, idx_cache = [], [], []
     for i in range(n_octaves):
+        smooth, rel, idx = array("d"), array("d"), array("l")
         delta = 1./res #size of current cell
         x_rel = 0. #x-pos in the current cell
         for x in range(S): #here x is coord of pixel
-            y_rel = 0. #y-pos in the current cell
             x2 = x_rel*x_rel
-            smoothx = 3.*x2 - 2.*x_rel*x2
-            smoothx_cache[i][x] = smoothx
-            idx_cache[i][x] = (int(x/res)*step, int(x/res)*step + step)
-            for y in range(S):
-                y2 = y_rel*y_rel
-                smoothy = 3.*y2 - 2.*y_rel*y2
-                diag_term = x_rel*y_rel - smoothx*y_rel - smoothy*x_rel
-                diag_term_cache[i][x][y] = diag_term
-                y_rel += delta
-                if y_rel >= 1.: #periodicity
-                    y_rel = 0.
+            smooth.append(3.*x2 - 2.*x_rel*x2)
+            rel.append(x_rel)
+            idx.extend((int(x/res)*step, int(x/res)*step + step))
             x_rel += delta
             if x_rel >= 1.: #periodicity
                 x_rel = 0.
+        smoothx_cache.append(smooth)
+        rel_cache.append(rel)
+        idx_cache.append(idx)
         res //= 2
         step = res//min_res
-    caches[(n_octaves,S)] = (smoothx_cache, diag_term_cache, idx_cache)
-    return caches[(n_octaves,S)]
+    caches[key] = (smoothx_cache, rel_cache, idx_cache)
+    while len(caches) > MAX_CACHES:
+        caches.popitem(last=False)
+    return caches[key]
 
 
 def normalize(terrain):
@@ -0,0 +1,55 @@
+"""This module provides numpy versions of the cached generators of
+noisegen.py (generate_terrain_cache and generate_terrain_local), which use
+them automatically when numpy is available.
+
+The same operations are done in the same order as in the pure python loops,
+on whole arrays instead of single pixels, so that the results are identical.
+This requires the cell sizes to be powers of two (i.e. a power of two size),
+for which the loops always agree on the cell of each pixel ; other sizes are
+left to the loops.
+"""
+import numpy as np
+
+
+def is_supported(size:int)->bool:
+    return size > 0 and size & (size - 1) == 0
+
+def get_diag_term(rel:np.ndarray, smooth:np.ndarray)->np.ndarray:
+    """(S,S) diag_term of get_cache, from the 1-D rows of one octave."""
+    return rel[:,None]*rel[None,:] - smooth[:,None]*rel[None,:] - smooth[None,:]*rel[:,None]
+
+def generate_terrain(h, min_res:int, S:int, n_octaves:int, persistence:float,
+                     smooth_rows, rel_rows)->list[list[float]]:
+    """Returns the terrain of noisegen.generate_terrain_cache for the random
+    heights <h> and the SMOOTH and REL tables of get_cache (read without
+    copy)."""
+    h = np.array(h, dtype=float)
+    terrain = np.zeros((S,S))
+    res = S
+    step = res//min_res
+    amplitude = persistence
+    for i in range(n_octaves):
+        smooth = np.frombuffer(smooth_rows[i], dtype=float)
+        diag_term = get_diag_term(np.frombuffer(rel_rows[i], dtype=float), smooth)
+        #polynom coefficients of each cell, as in the loops
+        idx0 = np.arange(S//res)*step
+        idx1 = idx0 + step
+        h00 = h[np.ix_(idx0, idx0)]
+        h01 = h[np.ix_(idx0, idx1)]
+        h10 = h[np.ix_(idx1, idx0)]
+        h11 = h[np.ix_(idx1, idx1)]
+        dx = h10 - h00
+        dy = h01 - h00
+        A = dx - h11 + h01
+        #pixels as (cell x, x in cell, cell y, y in cell) to broadcast cells on them
+        n = S//res
+        cell = lambda coeff:coeff[:,None,:,None]
+        smoothx = smooth.reshape((n,res,1,1))
+        smoothy = smooth.reshape((1,1,n,res))
+        dh = cell(h00) + smoothx*cell(dx) + smoothy*cell(dy) +\
+             cell(A)*diag_term.reshape((n,res,n,res))
+        terrain += amplitude*dh.reshape((S,S))
+        res //= 2
+        step = res//min_res
+        amplitude /= persistence
+    return terrain.tolist()
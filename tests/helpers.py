@@ -0,0 +1,26 @@
+"""Helpers shared by the tests : building small caches and the reference
+mosaics of generate_terrain the faster generators are compared to."""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from numpygen import noisegen as ng
+
+CLASSES = (ng.ZeroGradient, ng.NoiseCache, ng.Perlin)
+
+
+def build(cls, S=64, DEPTH=5, MIN_N=1, DOM_DIVIDER=2, **params):
+    c = cls()
+    c.S, c.DEPTH, c.MIN_N, c.DOM_DIVIDER, c.SEED = S, DEPTH, MIN_N, DOM_DIVIDER, 12
+    for name, value in params.items():
+        setattr(c, name, value)
+    c.build()
+    return c
+
+def mosaic(chunk0, width, height, c):
+    """Heightmap of <width> times <height> chunks from <chunk0>, chunk by chunk."""
+    return np.block([[ng.generate_terrain((chunk0[0]+i, chunk0[1]+j), c)
+                      for j in range(height)] for i in range(width)])
@@ -0,0 +1,63 @@
+"""Tests of the dispatch of backends.py: all the backends must give the same
+heights, and auto dispatch must skip those that are not available."""
+import importlib.util
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PARAMS = {"S":32, "DEPTH":4, "SEED":12}
+CHUNKS = [(0,0), (1,0), (3,2)]
+
+
+def import_package(): #backends.py uses relative imports
+    if "thornoise2" not in sys.modules:
+        spec = importlib.util.spec_from_file_location(
+            "thornoise2", os.path.join(ROOT, "__init__.py"),
+            submodule_search_locations=[ROOT])
+        sys.modules["thornoise2"] = module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    return importlib.import_module("thornoise2.backends")
+
+@pytest.fixture
+def backends(monkeypatch):
+    backends = import_package()
+    #make threads and processes available even on one core and for few pixels
+    monkeypatch.setattr(backends, "_get_cores", lambda:2)
+    monkeypatch.setattr(backends, "PROCESSES_MIN_PIXELS", 0)
+    yield backends
+    backends.close()
+
+
+@pytest.mark.parametrize("name", ("threads", "processes", "c"))
+def test_same_heights(backends, name):
+    if name == "c" and name not in backends.get_available_backends(CHUNKS, PARAMS):
+        pytest.skip("c/libzg.so is not built")
+    ref, used = backends.generate(CHUNKS, PARAMS, backend="numpy")
+    assert used == "numpy" and ref.shape == (3,32,32)
+    hmaps, used = backends.generate(CHUNKS, PARAMS, backend=name)
+    assert used == name and np.array_equal(hmaps, ref)
+
+def test_pure():
+    backends = import_package()
+    params = dict(PARAMS, LATTICE="hash", WORLD_SIDE_CHUNKS=None)
+    ref = backends.generate(CHUNKS, params, backend="numpy")[0]
+    assert np.array_equal(np.array(backends.generate(CHUNKS, params, backend="pure")[0]), ref)
+
+def test_fallback(backends, monkeypatch):
+    assert backends.generate(CHUNKS, PARAMS)[1] == "processes"
+    assert backends.generate((0,0), PARAMS)[1] in ("c", "numpy")
+    monkeypatch.setattr(backends, "_get_cores", lambda:1)
+    from thornoise2.numpygen import ckernel
+    monkeypatch.setattr(ckernel, "is_available", lambda:False)
+    assert backends.get_available_backends(CHUNKS, PARAMS) == ["numpy"]
+    hmaps, name = backends.generate(CHUNKS, PARAMS)
+    assert name == "numpy"
+    with pytest.raises(ValueError):
+        backends.generate(CHUNKS, PARAMS, backend="c")
+    with pytest.raises(ValueError):
+        backends.generate(CHUNKS, dict(PARAMS, noise="Perlin"), backend="pure")
+    with pytest.raises(ValueError):
+        backends.generate(CHUNKS, PARAMS, backend="gpu")
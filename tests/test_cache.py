@@ -0,0 +1,35 @@
+"""Tests of the memory cache of chunks of numpygen.cache."""
+import numpy as np
+
+from helpers import build
+from numpygen import noisegen as ng
+from numpygen.cache import ChunkCache
+
+
+def test_eviction():
+    c = build(ng.ZeroGradient, S=16, DEPTH=3)
+    nbytes = 16*16*8
+    chunks = ChunkCache(max_bytes=2*nbytes)
+    a = chunks.get((0,0), c)
+    assert np.array_equal(a, ng.generate_terrain((0,0), c))
+    assert chunks.get((0,0), c) is a #hit, no copy
+    chunks.get((1,0), c)
+    chunks.get((0,0), c) #(1,0) is now the least recently used
+    chunks.get((2,0), c)
+    assert ((0,0), c) in chunks and ((2,0), c) in chunks
+    assert ((1,0), c) not in chunks
+    assert chunks.get_stats() == {"hits":2, "misses":3, "evictions":1, "entries":2,
+                                  "nbytes":2*nbytes, "max_bytes":2*nbytes}
+
+def test_params_change_key():
+    c = build(ng.ZeroGradient, S=16, DEPTH=3)
+    chunks = ChunkCache(readonly=False)
+    a = chunks.get((0,0), c)
+    a[:] = 0 #writable copy: the stored heightmap is unchanged
+    assert np.array_equal(chunks.get((0,0), c), ng.generate_terrain((0,0), c))
+    #changing a parameter of the same cache selects other entries
+    c.SEED = 13
+    c.build()
+    assert ((0,0), c) not in chunks
+    assert np.array_equal(chunks.get((0,0), c), ng.generate_terrain((0,0), c))
+    assert chunks.get_stats()["misses"] == 2
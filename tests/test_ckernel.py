@@ -0,0 +1,14 @@
+"""Tests of the compiled kernel of numpygen.ckernel against numpy."""
+import numpy as np
+import pytest
+
+from helpers import build
+from numpygen import ckernel
+from numpygen import noisegen as ng
+
+
+def test_generate_terrain():
+    if not ckernel.is_available():
+        pytest.skip("c/libzg.so is not built")
+    c = build(ng.ZeroGradient)
+    assert np.array_equal(ckernel.generate_terrain((3,4), c), ng.generate_terrain((3,4), c))
@@ -0,0 +1,81 @@
+"""Tests of the vectorized colorization of numpygen.colorscale against the
+band by band reference."""
+import numpy as np
+import pytest
+
+from helpers import CLASSES, build
+from numpygen import colorscale
+from numpygen import noisegen as ng
+
+SCALES = ("SUMMER", "BEACH", "WINTER", "LIBNOISE", "MARBLE")
+
+
+@pytest.mark.parametrize("name", SCALES)
+def test_get(name):
+    scale = getattr(colorscale, name)
+    data = np.random.default_rng(0).uniform(-0.2, 1.2, (64,48))
+    #thresholds themselves belong to the upper band
+    data[0,:len(scale.colors)] = [M for c1,c2,m,M,delta in scale.colors]
+    ref = scale.get_by_bands(data)
+    assert np.array_equal(scale.get(data), ref)
+    out = np.empty((64,48,3), np.uint8)
+    assert np.array_equal(scale.get(data, out), np.clip(ref, 0, 255))
+
+@pytest.mark.parametrize("cls", CLASSES)
+def test_get_terrain(cls):
+    c = build(cls)
+    data = c.theoretical_normalize(ng.generate_terrain((1,2), c))
+    assert np.array_equal(colorscale.SUMMER.get(data), colorscale.SUMMER.get_by_bands(data))
+
+def test_get_lut():
+    scale = colorscale.SUMMER
+    data = np.random.default_rng(0).random((256,256))
+    ref = np.clip(scale.get(data), 0, 255)
+    lut = scale.get_lut(data)
+    assert lut.dtype == np.uint8
+    #see get_lut: colors may differ completely within half a step of a
+    #threshold, and by up to 5 elsewhere (steepest bands of SUMMER)
+    thresholds = np.array([M for c1,c2,m,M,delta in scale.colors])
+    far = np.abs(data[...,None] - thresholds).min(axis=-1) > 1./4095
+    assert np.abs(lut.astype(int) - ref)[far].max() <= 5
+    assert np.array_equal(scale.get_image(data, lut=True), lut)
+
+#small scale and heightmap whose colors and materials are computed by hand
+SMALL = colorscale.ColorScale([["water", (0,0,0), (0,0,200), 0.5],
+                               ["grass", (0,100,0), (0,200,0), 0.8],
+                               [(255,255,255), (255,255,255), 1.]])
+HMAP = np.array([[0.25, 0.6], [0.9, 1.5], [0.5, -0.1]])
+#above the bands: black ; below: extrapolated, then clipped
+RGB = np.array([[(0,0,100), (0,133,0)], [(255,255,255), (0,0,0)],
+                [(0,100,0), (0,0,0)]], dtype=np.uint8)
+
+def test_get_image():
+    assert np.array_equal(SMALL.get_image(HMAP), RGB)
+    bgra = SMALL.get_image(HMAP, "BGRA", order="F", transpose=True)
+    assert bgra.shape == (2,3,4) and bgra.flags.f_contiguous
+    assert np.array_equal(bgra[...,:3], RGB.transpose(1,0,2)[...,::-1])
+    assert np.all(bgra[...,3] == 255)
+    packed = SMALL.get_image(HMAP, "RGBA", packed=True)
+    assert packed.dtype == np.uint32 and packed.shape == (3,2)
+    assert np.array_equal(packed.view(np.uint8).reshape((3,2,4)),
+                          np.concatenate([RGB, np.full((3,2,1), 255, np.uint8)], axis=-1))
+    out = SMALL.empty_image((3,2), "XRGB", packed=True)
+    assert SMALL.get_image(HMAP, "XRGB", packed=True, out=out) is out
+    with pytest.raises(ValueError):
+        SMALL.get_image(HMAP, "RGB", packed=True)
+
+def test_material_map():
+    N = SMALL.NONE
+    assert np.array_equal(SMALL.get_material_map(HMAP), [[0, 1], [N, N], [1, N]])
+    assert np.array_equal(SMALL.get_color_index_map(HMAP), [[0, 1], [2, N], [1, N]])
+    names = list(SMALL.materials)
+    assert [[SMALL.get_material_from_h(h) for h in row] for row in HMAP] ==\
+           [[names[i] if i != N else None for i in row]
+            for row in SMALL.get_material_map(HMAP)]
+
+def test_material_stats():
+    assert SMALL.get_material_stats(HMAP) ==\
+           {"water":{"count":1, "coverage":1/6, "bbox":(0, 0, 0, 0)},
+            "grass":{"count":2, "coverage":2/6, "bbox":(0, 0, 2, 1)}}
+    stats = SMALL.get_material_stats(np.full((4,5), 0.9))
+    assert stats["water"] == {"count":0, "coverage":0., "bbox":None}
@@ -0,0 +1,18 @@
+"""Tests of the parallel generators of numpygen.farm against generate_chunks."""
+import numpy as np
+import pytest
+
+from helpers import CLASSES, build, mosaic
+from numpygen import farm
+from numpygen import noisegen as ng
+
+
+@pytest.mark.parametrize("cls", CLASSES)
+def test_chunk_farm(cls):
+    c = build(cls, S=32)
+    chunks = [(2,1), (0,0), (5,3)]
+    with farm.ChunkFarm(c, workers=2) as f:
+        assert np.array_equal(f.generate_region((1,2), 3, 2, chunks_per_task=1),
+                              mosaic((1,2), 3, 2, c))
+        assert np.array_equal(f.generate_chunks(chunks, chunks_per_task=2),
+                              ng.generate_chunks(chunks, c))
@@ -0,0 +1,129 @@
+"""Regression tests of the vectorized generators of numpygen against the
+per-cell polynoms (__init__ and fill_array), and of the faster variants of
+generate_terrain against it. All of them must give bit-identical heights."""
+import numpy as np
+import pytest
+
+from helpers import CLASSES, build, mosaic
+from numpygen import noisegen as ng
+
+#(S, DEPTH, MIN_N, DOM_DIVIDER)
+SHAPES = ((64, 5, 1, 2), (64, 4, 2, 2), (54, 3, 2, 3), (81, 4, 1, 3))
+
+
+def reference_terrain(chunk, c, conditions=ng.get_seeded_conditions):
+    """generate_terrain with the per-cell polynoms, as before vectorization."""
+    hmap = np.zeros((c.S,c.S))
+    for k in c.LEVELS:
+        tabs = conditions(chunk, k, c)
+        h, f, g = (tabs, None, None) if isinstance(tabs, np.ndarray) else tabs
+        for x in range(c.PARAM_N[k]):
+            for y in range(c.PARAM_N[k]):
+                cell = lambda tab:None if tab is None else tab[x:x+2,y:y+2]
+                c.polynom(cell(h), cell(f), cell(g)).fill_array(hmap, c, k, x, y)
+    return hmap
+
+
+@pytest.mark.parametrize("cls", CLASSES)
+@pytest.mark.parametrize("shape", SHAPES)
+def test_generate_terrain(cls, shape):
+    c = build(cls, *shape)
+    for chunk in ((0,0), (3,2)):
+        assert np.array_equal(ng.generate_terrain(chunk, c), reference_terrain(chunk, c))
+
+@pytest.mark.parametrize("shape", SHAPES)
+def test_generate_terrain_d2m1n3(shape):
+    c = build(ng.ZeroGradient, *shape)
+    ref = reference_terrain((2,5), c, ng.get_seeded_conditions_d2m1n3)
+    assert np.array_equal(ng.generate_terrain_d2m1n3((2,5), c), ref)
+
+@pytest.mark.parametrize("cls", CLASSES)
+def test_generate_chunks(cls):
+    c = build(cls)
+    chunks = [(0,0), (1,0), (0,1), (4,7)]
+    hmaps = ng.generate_chunks(chunks, c)
+    for chunk, hmap in zip(chunks, hmaps):
+        assert np.array_equal(hmap, ng.generate_terrain(chunk, c))
+
+@pytest.mark.parametrize("cls", CLASSES)
+def test_philox(cls):
+    from numpygen import farm
+    c = build(cls, PRNG="philox")
+    chunks = [(0,0), (1,0), (-3,2)]
+    ref = ng.generate_chunks(chunks, c)
+    assert np.array_equal(farm.generate_chunks_threaded(chunks, c, workers=3), ref)
+    other = build(cls, PRNG="philox", SEED=13)
+    assert not np.array_equal(ng.generate_terrain((0,0), other), ref[0])
+    other.lattice_memo = ng.LatticeMemo()
+    assert not np.array_equal(ng.generate_terrain((0,0), other), ref[0])
+
+@pytest.mark.parametrize("cls", CLASSES)
+def test_generate_window(cls):
+    c = build(cls)
+    ref = mosaic((0,0), 4, 2, c)
+    assert np.array_equal(ng.generate_window(50, 10, 150, 100, c), ref[50:200,10:110])
+
+@pytest.mark.parametrize("cls", CLASSES)
+def test_sample_points(cls):
+    c = build(cls)
+    ref = mosaic((0,0), 2, 2, c)
+    xs, ys = np.random.default_rng(0).integers(0, 128, (2,200))
+    assert np.array_equal(ng.sample_points(xs, ys, c), ref[xs,ys])
+
+@pytest.mark.parametrize("cls", CLASSES)
+def test_compact(cls):
+    c = build(cls, COMPACT=True)
+    assert np.array_equal(ng.generate_terrain((1,2), c),
+                          ng.generate_terrain((1,2), build(cls)))
+
+@pytest.mark.parametrize("cls", CLASSES)
+@pytest.mark.parametrize("compact", (False, True))
+def test_float32(cls, compact):
+    c = build(cls, DTYPE="float32", COMPACT=compact)
+    ref = ng.generate_terrain((1,2), build(cls))
+    hmap = ng.generate_terrain((1,2), c)
+    assert hmap.dtype == np.float32
+    assert np.abs(hmap - ref).max() < 2e-6*c.max_h
+    #no float64 copy of the cached spaces is kept
+    assert all(space.dtype == np.float32 for spaces in c.spaces for space in spaces.values())
+    if not compact:
+        assert c.X[0].dtype == np.float32
+
+@pytest.mark.parametrize("cls", CLASSES)
+def test_quantize(cls):
+    c = build(cls)
+    ref = ng.generate_terrain((1,2), c)
+    q = ng.generate_terrain((1,2), c, dtype="uint16")
+    assert q.dtype == np.uint16
+    assert np.array_equal(q, ng.quantize(ref, c))
+    heights = (q/65535.*2 - 1)*c.max_h
+    inside = np.abs(ref) <= c.max_h #NoiseCache and Perlin may overshoot (clipped)
+    assert np.abs(heights - ref)[inside].max() <= c.max_h/65535*(1 + 1e-9)
+    assert np.array_equal(ng.quantize(np.array([-2*c.max_h, 0., 2*c.max_h]), c),
+                          [0, 32768, 65535])
+    with pytest.raises(ValueError):
+        ng.generate_terrain((1,2), c, dtype="int16")
+
+@pytest.mark.parametrize("cls", CLASSES)
+def test_lod_exact(cls):
+    c = build(cls)
+    for lod in (2, 4, 16):
+        assert np.array_equal(ng.generate_terrain((1,2), c, lod=lod, exact=True),
+                              ng.generate_terrain((1,2), c)[::lod,::lod])
+
+@pytest.mark.parametrize("cls", CLASSES)
+def test_partial_terrain(cls):
+    c = build(cls)
+    terrain = ng.PartialTerrain((1,2), c)
+    terrain.refine(2)
+    assert not terrain.is_complete()
+    assert np.array_equal(terrain.refine(), ng.generate_terrain((1,2), c))
+
+@pytest.mark.parametrize("cls", CLASSES)
+def test_lattice_memo(cls):
+    c = build(cls)
+    ref = [ng.generate_terrain(chunk, c) for chunk in ((0,0), (1,0), (0,0))]
+    c.lattice_memo = ng.LatticeMemo()
+    for chunk, hmap in zip(((0,0), (1,0), (0,0)), ref):
+        assert np.array_equal(ng.generate_terrain(chunk, c), hmap)
+    assert c.lattice_memo.get_stats()["hits"] > 0
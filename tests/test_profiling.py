@@ -0,0 +1,34 @@
+"""Tests of the instrumentation of numpygen.profiling."""
+import json
+
+from helpers import build
+from numpygen import colorscale
+from numpygen import noisegen as ng
+from numpygen.profiling import profile, stage
+
+
+def test_stages(tmp_path):
+    c = build(ng.ZeroGradient, S=16, DEPTH=3)
+    events = []
+    with profile(track_memory=True, callback=events.append) as prof:
+        hmap = ng.generate_terrain((1,2), c, dtype="uint16")
+        colorscale.SUMMER.get(hmap/65535.)
+    assert stage("outside") is stage("other") #no profile: shared null context
+    d = prof.to_dict()
+    assert set(d["stages"]) == {"generate_terrain", "seeding", "coefficients",
+                                "evaluation", "accumulation", "normalization",
+                                "colorization"}
+    assert d["stages"]["seeding"]["calls"] == 3
+    assert set(d["octaves"]) >= {"evaluation[k=%d]" % k for k in range(3)}
+    assert d["stages"]["generate_terrain"]["bytes"] is None #has children
+    assert d["stages"]["evaluation"]["bytes"] > 0
+    assert events == d["events"]
+    outer = [e for e in events if e["name"] == "generate_terrain"]
+    assert len(outer) == 1 and outer[0]["args"]["chunk"] == (1,2)
+    prof.save_chrome_trace(str(tmp_path/"trace.json"))
+    with open(tmp_path/"trace.json") as f:
+        trace = json.load(f)
+    assert len(trace["traceEvents"]) == len(events)
+    for e in trace["traceEvents"]:
+        assert e["ph"] == "X" and e["dur"] >= 0 and e["ts"] >= 0
+        assert set(e) == {"name", "ph", "pid", "tid", "args", "ts", "dur"}
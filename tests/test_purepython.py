@@ -0,0 +1,27 @@
+"""Tests of the pure python generators of purepython.noisegen."""
+import random
+
+import numpy as np
+import pytest
+
+import helpers #noqa: F401, puts the package on sys.path
+from purepython import noisegen as pg
+
+
+@pytest.mark.parametrize("generate", (pg.generate_terrain_cache, pg.generate_terrain_local))
+def test_numpy(generate, monkeypatch):
+    results = []
+    for use_numpy in (False, True):
+        monkeypatch.setattr(pg, "USE_NUMPY", use_numpy)
+        random.seed(0) #the bulk of the lattice uses the global random state
+        results.append(generate(32, 4, (2,3)))
+    assert np.array_equal(np.array(results[0]), np.array(results[1]))
+
+@pytest.mark.parametrize("generate", (pg.generate_terrain, pg.generate_terrain_cache,
+                                      pg.generate_terrain_local))
+def test_world_size(generate):
+    random.seed(0)
+    ref = generate(16, 3, (5,1), world_side_chunks=2)
+    random.seed(0)
+    with pytest.warns(DeprecationWarning):
+        assert generate(16, 3, (5,1), world_size=2) == ref
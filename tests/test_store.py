@@ -0,0 +1,37 @@
+"""Tests of the disk store of chunks of numpygen.store."""
+import json
+import os
+
+import numpy as np
+
+from helpers import build
+from numpygen import noisegen as ng
+from numpygen.store import ChunkStore, get_params_hash
+
+
+def test_round_trip(tmp_path):
+    c = build(ng.NoiseCache, S=16, DEPTH=3)
+    store = ChunkStore(str(tmp_path), c)
+    assert (2,3) not in store
+    hmap = store.get((2,3))
+    assert (2,3) in store
+    assert isinstance(hmap, np.memmap) and not hmap.flags.writeable
+    assert np.array_equal(hmap, ng.generate_terrain((2,3), c))
+    #another store on the same folder reads the file back without generating
+    assert np.array_equal(ChunkStore(str(tmp_path), c, generator=None).get((2,3)), hmap)
+    store.save((0,0), np.ones((16,16), np.float32))
+    loaded = store.load((0,0))
+    assert loaded.dtype == np.float32 and np.array_equal(loaded, np.ones((16,16)))
+
+def test_folders(tmp_path):
+    c = build(ng.NoiseCache, S=16, DEPTH=3)
+    store = ChunkStore(str(tmp_path), c)
+    assert os.path.basename(store.folder) == "NoiseCache_" + get_params_hash(c)
+    with open(os.path.join(store.folder, "params.json")) as f:
+        assert json.load(f)["SEED"] == 12
+    store.get((0,0))
+    other = ChunkStore(str(tmp_path), build(ng.NoiseCache, S=16, DEPTH=3, SEED=13))
+    assert other.folder != store.folder and (0,0) not in other
+    assert ChunkStore(str(tmp_path), build(ng.Perlin, S=16, DEPTH=3)).folder != store.folder
+    other.purge_others()
+    assert sorted(os.listdir(tmp_path)) == [os.path.basename(other.folder)]
@@ -0,0 +1,26 @@
+"""Tests of the streaming generators of numpygen.stream against the chunk by
+chunk generators."""
+import numpy as np
+import pytest
+
+from helpers import CLASSES, build, mosaic
+from numpygen import noisegen as ng
+from numpygen import stream
+
+
+@pytest.mark.parametrize("cls", CLASSES)
+def test_iter_strips(cls):
+    c = build(cls)
+    strips = [strip for y, strip in stream.iter_strips(c, (1,0), 3, 2, 5, max_tiles=1)]
+    assert np.array_equal(np.concatenate(strips, axis=1), mosaic((1,0), 3, 2, c))
+
+@pytest.mark.parametrize("cls", CLASSES)
+@pytest.mark.parametrize("depth, strip_height", ((1, 16*9), (2, 480), (2, 40), (3, 30)))
+def test_tall_strips(cls, depth, strip_height):
+    #strips covering more than 2 chunk rows, aligned or not
+    c = build(cls, S=16, DEPTH=depth)
+    chunks = [(i,j) for i in range(2) for j in range(9)]
+    ref = np.block([[hmap for hmap in column]
+                    for column in ng.generate_chunks(chunks, c).reshape((2,9,16,16))])
+    strips = [strip for y, strip in stream.iter_strips(c, (0,0), 2, 9, strip_height)]
+    assert np.array_equal(np.concatenate(strips, axis=1), ref)
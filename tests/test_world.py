@@ -0,0 +1,65 @@
+"""Tests of toroidal worlds (LATTICE "world" and "hash"): the world must tile
+seamlessly and chunk coordinates must wrap around."""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from numpygen import noisegen as ng
+
+CLASSES = (ng.ZeroGradient, ng.NoiseCache, ng.Perlin)
+WORLD = (3,2)
+
+
+def build(cls, lattice, world=WORLD):
+    c = cls()
+    c.S, c.DEPTH, c.SEED = 32, 4, 5
+    c.LATTICE = lattice
+    c.WORLD_SIDE_CHUNKS = world
+    c.build()
+    return c
+
+
+@pytest.mark.parametrize("cls", CLASSES)
+@pytest.mark.parametrize("lattice", ("world", "hash"))
+def test_generate_world(cls, lattice):
+    c = build(cls, lattice)
+    W, H = WORLD
+    ref = np.block([[ng.generate_terrain((l,t), c) for t in range(H)] for l in range(W)])
+    assert np.array_equal(ng.generate_world(c), ref)
+
+@pytest.mark.parametrize("cls", CLASSES)
+@pytest.mark.parametrize("lattice", ("world", "hash"))
+def test_wrap(cls, lattice):
+    c = build(cls, lattice)
+    W, H = WORLD
+    assert np.array_equal(ng.generate_terrain((W,0), c), ng.generate_terrain((0,0), c))
+    assert np.array_equal(ng.generate_terrain((1,-H), c), ng.generate_terrain((1,0), c))
+    #a window across the border of the world is cut from the tiled world
+    tiled = np.tile(ng.generate_world(c), (2,2))
+    x, y = W*c.S - 10, H*c.S - 7
+    assert np.array_equal(ng.generate_window(x, y, 20, 15, c), tiled[x:x+20,y:y+15])
+
+@pytest.mark.parametrize("cls", CLASSES)
+@pytest.mark.parametrize("lattice", ("world", "hash"))
+def test_seamless(cls, lattice):
+    assert ng.get_seam_error(build(cls, lattice)) == 0.
+
+def test_world_keeps_seeded_heights():
+    seeded, world = build(ng.ZeroGradient, "seeded"), build(ng.ZeroGradient, "world")
+    assert np.array_equal(ng.generate_world(world), ng.generate_world(seeded))
+    assert np.array_equal(ng.generate_terrain_d2m1n3((2,1), world),
+                          ng.generate_terrain_d2m1n3((2,1), seeded))
+
+def test_invalid_worlds():
+    with pytest.raises(ValueError):
+        build(ng.ZeroGradient, "hash", (1,1)) #every chunk would be the same
+    with pytest.raises(ValueError):
+        build(ng.ZeroGradient, "world", None)
+    with pytest.raises(ValueError):
+        build(ng.ZeroGradient, "world", (1000,1000)) #too big
+    c = build(ng.ZeroGradient, "hash", None) #unbounded
+    assert not np.array_equal(ng.generate_terrain((0,0), c), ng.generate_terrain((3,0), c))